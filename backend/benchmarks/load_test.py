@@ -0,0 +1,306 @@
+"""Load test for the hot API routes against MongoDB or mongomock-motor.
+
+Seeds a realistic data volume, then drives each scenario (login, lead
+list, lead stats, contact creation, the AI routes and seeding) with a
+fixed number of concurrent requests through the ASGI app. The LLM is
+the local stub backend, so AI timings measure our own overhead plus
+--llm-latency-ms. Writes a JSON report with throughput and p50/p95/p99
+latency per scenario; pass the report of a previous release as
+--baseline to flag regressions.
+
+    cd backend
+    python benchmarks/load_test.py --mongo mongomock --leads 1000
+    python benchmarks/load_test.py --leads 100000 --output after.json --baseline before.json
+
+--mongo mongod uses MONGO_URL and drops --db-name before seeding, so
+never point it at a database you care about. --mongo mongomock needs
+`pip install mongomock-motor`; it keeps everything in memory, runs
+cascading writes without transactions and is only practical up to
+around 100k leads.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import types
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from report import summarize  # noqa: E402
+
+PASSWORD = "benchmark-password"
+STATUSES = ["new", "contacted", "qualified", "proposal", "won", "lost"]
+SEED_BATCH_SIZE = 10000
+
+server = None
+
+
+def prepare_environment(args):
+    """Configure and import server; it reads its settings at import time"""
+    global server
+    os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+    os.environ['DB_NAME'] = args.db_name
+    os.environ['LLM_BACKEND'] = 'stub'
+    os.environ['LLM_STUB_LATENCY_MS'] = str(args.llm_latency_ms)
+    os.environ['AI_SCORING_ENABLED'] = 'false'
+    os.environ.setdefault('STATS_RECONCILE_SECONDS', '0')
+
+    try:
+        import emergentintegrations.llm.chat  # noqa: F401
+    except ImportError:
+        # The stub backend never calls LlmChat, but server imports it at load time
+        chat = types.ModuleType("emergentintegrations.llm.chat")
+        chat.LlmChat = chat.UserMessage = None
+        sys.modules["emergentintegrations"] = types.ModuleType("emergentintegrations")
+        sys.modules["emergentintegrations.llm"] = types.ModuleType("emergentintegrations.llm")
+        sys.modules["emergentintegrations.llm.chat"] = chat
+
+    if args.mongo == "mongomock":
+        import motor.motor_asyncio
+        from mongomock_motor import AsyncMongoMockClient
+
+        def mock_client(url, **kwargs):
+            # mongomock has no command monitoring
+            kwargs.pop("event_listeners", None)
+            return AsyncMongoMockClient(url, **kwargs)
+
+        motor.motor_asyncio.AsyncIOMotorClient = mock_client
+
+    import server as server_module
+    server = server_module
+    if args.mongo == "mongomock":
+        # mongomock has no sessions; cascades (lead delete, bulk delete and re-assign) run without a transaction
+        server.transactions_supported = False
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def lead_document(user_id, n, now):
+    example = server.EXAMPLE_LEADS[n % len(server.EXAMPLE_LEADS)]
+    return {
+        "id": str(uuid.uuid4()),
+        "company_name": f"{example['company_name']} {n}",
+        "industry": example["industry"],
+        "company_size": example["company_size"],
+        "website": example["website"],
+        "status": random.choice(STATUSES),
+        "notes": example["notes"],
+        "qualification_score": random.randint(1, 10),
+        "ai_insights": None,
+        "ai_score_pending": False,
+        "created_at": now,
+        "updated_at": now,
+        "user_id": user_id,
+    }
+
+
+async def seed(client, users, leads):
+    """Register users through the API and bulk insert leads directly, split evenly between them"""
+    accounts = []
+    for i in range(users):
+        r = await client.post("/api/auth/register", json={
+            "email": f"bench{i}@example.com", "password": PASSWORD, "name": f"Bench {i}"
+        })
+        r.raise_for_status()
+        body = r.json()
+        accounts.append({"id": body["user"]["id"], "email": f"bench{i}@example.com", "token": body["token"]})
+
+    now = datetime.now(timezone.utc).isoformat()
+    lead_ids = {account["id"]: [] for account in accounts}
+    batch = []
+    for n in range(leads):
+        account = accounts[n % users]
+        doc = lead_document(account["id"], n, now)
+        # Keep a sample of ids per user for the routes that need one
+        if len(lead_ids[account["id"]]) < 1000:
+            lead_ids[account["id"]].append(doc["id"])
+        batch.append(doc)
+        if len(batch) == SEED_BATCH_SIZE:
+            await server.db.leads.insert_many(batch)
+            batch = []
+    if batch:
+        await server.db.leads.insert_many(batch)
+    for account in accounts:
+        await server.recompute_lead_stats(account["id"])
+        account["lead_ids"] = lead_ids[account["id"]]
+    return accounts
+
+
+def scenarios(accounts):
+    """Map scenario name to a function building the i-th request as (method, url, kwargs)"""
+    def auth(i):
+        return {"Authorization": f"Bearer {accounts[i % len(accounts)]['token']}"}
+
+    def lead_id(i):
+        ids = accounts[i % len(accounts)]["lead_ids"]
+        return ids[i // len(accounts) % len(ids)]
+
+    return {
+        "login": lambda i: ("POST", "/api/auth/login", {
+            "json": {"email": accounts[i % len(accounts)]["email"], "password": PASSWORD}
+        }),
+        "list_leads": lambda i: ("GET", "/api/leads", {"headers": auth(i)}),
+        "list_leads_fields": lambda i: ("GET", "/api/leads", {
+            "headers": auth(i), "params": {"fields": "company_name,status,qualification_score"}
+        }),
+        "lead_stats": lambda i: ("GET", "/api/leads/stats/summary", {"headers": auth(i)}),
+        "create_contact": lambda i: ("POST", "/api/contacts", {
+            "headers": auth(i), "json": {"lead_id": lead_id(i), "name": f"Contact {i}", "title": "HR Director"}
+        }),
+        "ai_research": lambda i: ("POST", "/api/ai/research", {
+            "headers": auth(i), "json": {"company_name": f"Benchmark Company {i}", "industry": "Technology"}
+        }),
+        "ai_research_cached": lambda i: ("POST", "/api/ai/research", {
+            "headers": auth(i), "json": {"company_name": f"Benchmark Company {i % 10}", "industry": "Technology"}
+        }),
+        "ai_generate_email": lambda i: ("POST", "/api/ai/generate-email", {
+            "headers": auth(i), "params": {"lead_id": lead_id(i)}
+        }),
+        "seed_leads": lambda i: ("POST", "/api/leads/seed", {"headers": auth(i)}),
+    }
+
+
+async def run_scenario(client, build_request, requests, concurrency):
+    latencies = []
+    errors = 0
+    next_request = 0
+
+    async def worker():
+        nonlocal errors, next_request
+        while next_request < requests:
+            i = next_request
+            next_request += 1
+            method, url, kwargs = build_request(i)
+            started = time.perf_counter()
+            r = await client.request(method, url, **kwargs)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if r.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        **summarize(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def compare(report, baseline, tolerance):
+    """Flag scenarios whose p95 grew or throughput fell by more than tolerance"""
+    comparison = {}
+    for name, current in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        p95_change = (current["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"] if previous["p95_ms"] else 0.0
+        rps_change = (
+            (current["throughput_rps"] - previous["throughput_rps"]) / previous["throughput_rps"]
+            if previous["throughput_rps"] else 0.0
+        )
+        comparison[name] = {
+            "p95_ms": [previous["p95_ms"], current["p95_ms"]],
+            "p95_change_pct": round(p95_change * 100, 1),
+            "throughput_rps": [previous["throughput_rps"], current["throughput_rps"]],
+            "throughput_change_pct": round(rps_change * 100, 1),
+            "regression": p95_change > tolerance or rps_change < -tolerance,
+        }
+    return comparison
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo", choices=["mongod", "mongomock"], default="mongod")
+    parser.add_argument("--db-name", default="spinmr_leads_bench")
+    parser.add_argument("--leads", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--llm-latency-ms", type=int, default=50)
+    parser.add_argument("--scenarios", help="comma-separated subset of scenarios to run")
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    parser.add_argument("--baseline", help="previous JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95/throughput change, as a fraction")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    prepare_environment(args)
+    await server.client.drop_database(args.db_name)
+    for handler in server.app.router.on_startup:
+        await handler()
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        seed_started = time.perf_counter()
+        accounts = await seed(client, args.users, args.leads)
+        seed_seconds = time.perf_counter() - seed_started
+
+        available = scenarios(accounts)
+        selected = args.scenarios.split(",") if args.scenarios else list(available)
+        unknown = [name for name in selected if name not in available]
+        if unknown:
+            parser.error(f"unknown scenarios: {', '.join(unknown)} (choose from {', '.join(available)})")
+
+        results = {}
+        for name in selected:
+            results[name] = await run_scenario(client, available[name], args.requests, args.concurrency)
+            print(f"{name}: {results[name]['throughput_rps']} req/s, p95 {results[name]['p95_ms']}ms",
+                  file=sys.stderr)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "mongo": args.mongo,
+            "leads": args.leads,
+            "users": args.users,
+            "requests_per_scenario": args.requests,
+            "concurrency": args.concurrency,
+            "llm_latency_ms": args.llm_latency_ms,
+            "bcrypt_rounds": server.BCRYPT_ROUNDS,
+            "seed_seconds": round(seed_seconds, 3),
+        },
+        "scenarios": results,
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["comparison"] = compare(report, json.load(f), args.tolerance)
+
+    await server.client.drop_database(args.db_name)
+    for handler in server.app.router.on_shutdown:
+        await handler()
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    if any(entry["regression"] for entry in report.get("comparison", {}).values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+"""Login storm benchmark for the bcrypt password pool.
+
+Runs a burst of concurrent password verifications while probing the
+unrelated GET /api/health route, once with bcrypt called inline on the
+event loop (the old behaviour) and once through server.verify_password.
+Prints the probe latency percentiles for both runs as JSON.
+
+    cd backend
+    python benchmarks/password_pool.py --logins 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import bcrypt
+import httpx
+from fastapi import HTTPException
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'spinmr_leads_bench')
+
+import server  # noqa: E402
+from report import summarize  # noqa: E402
+
+
+async def run_storm(mode, hashed, logins, concurrency, probe_interval):
+    semaphore = asyncio.Semaphore(concurrency)
+    rejected = 0
+
+    async def login():
+        nonlocal rejected
+        async with semaphore:
+            if mode == "inline":
+                server._verify_password("benchmark-password", hashed)
+                await asyncio.sleep(0)
+                return
+            try:
+                await server.verify_password("benchmark-password", hashed)
+            except HTTPException:
+                rejected += 1
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        latencies = []
+        storm = asyncio.gather(*(login() for _ in range(logins)))
+        started = time.perf_counter()
+        scheduled = started
+        while not storm.done():
+            # Measure from the scheduled start so event loop stalls are not omitted
+            await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+            await client.get("/api/health")
+            latencies.append((time.perf_counter() - scheduled) * 1000)
+            scheduled += probe_interval
+        await storm
+        elapsed = time.perf_counter() - started
+
+    return {
+        "mode": mode,
+        "logins": logins,
+        "rejected_logins": rejected,
+        "storm_seconds": round(elapsed, 3),
+        "health_probe": summarize(latencies),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--probe-interval-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    hashed = bcrypt.hashpw(b"benchmark-password", bcrypt.gensalt(rounds=server.BCRYPT_ROUNDS)).decode('utf-8')
+    probe_interval = args.probe_interval_ms / 1000
+    report = {
+        "bcrypt_rounds": server.BCRYPT_ROUNDS,
+        "password_hash_workers": server.PASSWORD_HASH_WORKERS,
+        "password_hash_max_pending": server.PASSWORD_HASH_MAX_PENDING,
+        "before": await run_storm("inline", hashed, args.logins, args.concurrency, probe_interval),
+        "after": await run_storm("pool", hashed, args.logins, args.concurrency, probe_interval),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
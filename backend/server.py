@@ -1,34 +1,335 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, Response, WebSocket, WebSocketDisconnect, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, TEXT, DeleteMany, IndexModel, InsertOne, ReturnDocument, UpdateMany, UpdateOne, monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
 import os
+import io
+import csv
+import json
+import tempfile
+import asyncio
+import base64
+import hashlib
+import re
+import struct
+import functools
+import unicodedata
+import random
+import socket
+import time
+import bisect
 import logging
+import threading
+import contextvars
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional
+from urllib.parse import urlsplit
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, ValidationError
+from typing import List, Literal, Optional
 import uuid
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
 import jwt
 import bcrypt
+import orjson
+from cachetools import LRUCache, TTLCache
 from emergentintegrations.llm.chat import LlmChat, UserMessage
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
 # JWT Config
 JWT_SECRET = os.environ.get('JWT_SECRET', 'hr_lead_gen_secret')
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24
 
+# Password hashing Config
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 4))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 64))
+
+# Auth cache Config
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 10000))
+USER_CACHE_TTL_SECONDS = int(os.environ.get('USER_CACHE_TTL_SECONDS', 60))
+TOKEN_CACHE_ENABLED = os.environ.get('TOKEN_CACHE_ENABLED', 'true').lower() == 'true'
+
+# Template engine Config
+TEMPLATE_CACHE_SIZE = int(os.environ.get('TEMPLATE_CACHE_SIZE', 1000))
+MAIL_MERGE_MAX_RECIPIENTS = int(os.environ.get('MAIL_MERGE_MAX_RECIPIENTS', 1000))
+
 # LLM Config
 EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY')
+LLM_PROVIDER = "openai"
+LLM_MODEL = "gpt-5.2"
+# "emergent" for the real provider, "stub" for a local deterministic one (tests, benchmarks)
+LLM_BACKEND = os.environ.get('LLM_BACKEND', 'emergent').lower()
+LLM_STUB_LATENCY_MS = int(os.environ.get('LLM_STUB_LATENCY_MS', 200))
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 16))
+LLM_RATE_LIMIT_RETRIES = int(os.environ.get('LLM_RATE_LIMIT_RETRIES', 5))
+LLM_RATE_LIMIT_BACKOFF_SECONDS = float(os.environ.get('LLM_RATE_LIMIT_BACKOFF_SECONDS', 1))
+
+# AI response cache Config
+AI_CACHE_TTL_SECONDS = int(os.environ.get('AI_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+AI_CACHE_MAX_ENTRIES = int(os.environ.get('AI_CACHE_MAX_ENTRIES', 50000))
+AI_CACHE_MEMORY_SIZE = int(os.environ.get('AI_CACHE_MEMORY_SIZE', 1000))
+AI_CACHE_MEMORY_TTL_SECONDS = int(os.environ.get('AI_CACHE_MEMORY_TTL_SECONDS', 600))
+AI_CACHE_PRUNE_EVERY = 100
+
+# AI batch Config
+AI_BATCH_CONCURRENCY = int(os.environ.get('AI_BATCH_CONCURRENCY', 8))
+AI_BATCH_MAX_ITEMS = int(os.environ.get('AI_BATCH_MAX_ITEMS', 1000))
+AI_BATCH_MAX_RETRIES = int(os.environ.get('AI_BATCH_MAX_RETRIES', 3))
+AI_BATCH_BACKOFF_SECONDS = float(os.environ.get('AI_BATCH_BACKOFF_SECONDS', 2))
+
+# AI lead scoring Config
+AI_SCORING_ENABLED = os.environ.get('AI_SCORING_ENABLED', 'false').lower() == 'true'
+AI_SCORING_BATCH_SIZE = int(os.environ.get('AI_SCORING_BATCH_SIZE', 10))
+AI_SCORING_CONCURRENCY = int(os.environ.get('AI_SCORING_CONCURRENCY', 2))
+AI_SCORING_POLL_SECONDS = float(os.environ.get('AI_SCORING_POLL_SECONDS', 30))
+AI_SCORING_LEASE_SECONDS = int(os.environ.get('AI_SCORING_LEASE_SECONDS', 300))
+AI_SCORING_MAX_ATTEMPTS = int(os.environ.get('AI_SCORING_MAX_ATTEMPTS', 3))
+
+# Server-sent events Config
+SSE_KEEPALIVE_SECONDS = float(os.environ.get('SSE_KEEPALIVE_SECONDS', 15))
+
+# Change feed Config ("auto" uses a MongoDB change stream where the deployment supports one, "memory" only sees
+# writes made by this process)
+CHANGE_FEED_SOURCE = os.environ.get('CHANGE_FEED_SOURCE', 'auto').lower()
+CHANGE_FEED_REPLAY_SIZE = int(os.environ.get('CHANGE_FEED_REPLAY_SIZE', 500))
+CHANGE_FEED_REPLAY_USERS = int(os.environ.get('CHANGE_FEED_REPLAY_USERS', 10000))
+CHANGE_FEED_QUEUE_SIZE = int(os.environ.get('CHANGE_FEED_QUEUE_SIZE', 1000))
+CHANGE_FEED_KEEPALIVE_SECONDS = float(os.environ.get('CHANGE_FEED_KEEPALIVE_SECONDS', 30))
+CHANGE_FEED_AUTH_TIMEOUT_SECONDS = float(os.environ.get('CHANGE_FEED_AUTH_TIMEOUT_SECONDS', 10))
+
+# Pagination Config
+LIST_PAGE_SIZE = int(os.environ.get('LIST_PAGE_SIZE', 100))
+LIST_PAGE_SIZE_MAX = int(os.environ.get('LIST_PAGE_SIZE_MAX', 1000))
+STREAM_BATCH_SIZE = int(os.environ.get('STREAM_BATCH_SIZE', 500))
+
+# Bulk import Config
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 1000))
+IMPORT_MAX_ERRORS = int(os.environ.get('IMPORT_MAX_ERRORS', 1000))
+IMPORT_SPOOL_BYTES = int(os.environ.get('IMPORT_SPOOL_BYTES', 8 * 1024 * 1024))
+
+# Contact dedup Config
+CONTACT_DEDUP_MAX_CLUSTERS = int(os.environ.get('CONTACT_DEDUP_MAX_CLUSTERS', 10000))
+CONTACT_DEDUP_BACKFILL_BATCH = 1000
+
+# Lead dedup Config (names at or above LEAD_MATCH_THRESHOLD trigram similarity are near-duplicates)
+LEAD_MATCH_THRESHOLD = float(os.environ.get('LEAD_MATCH_THRESHOLD', 0.6))
+LEAD_DEDUP_MAX_BUCKET = int(os.environ.get('LEAD_DEDUP_MAX_BUCKET', 1000))
+LEAD_DEDUP_MAX_CLUSTERS = int(os.environ.get('LEAD_DEDUP_MAX_CLUSTERS', 10000))
+LEAD_DEDUP_BACKFILL_BATCH = 1000
+
+# Bulk lead operations Config
+BULK_MAX_IDS = int(os.environ.get('BULK_MAX_IDS', 10000))
+BULK_CHUNK_SIZE = 1000
+# Email domains whose users form a team that can re-assign leads among themselves
+REASSIGN_TEAM_DOMAINS = {d.strip().lower() for d in os.environ.get('REASSIGN_TEAM_DOMAINS', '').split(',') if d.strip()}
+
+# Job queue Config (JOB_WORKERS_IN_PROCESS > 0 also runs workers inside the API process)
+JOB_WORKERS_IN_PROCESS = int(os.environ.get('JOB_WORKERS_IN_PROCESS', 0))
+JOB_WORKER_CONCURRENCY = int(os.environ.get('JOB_WORKER_CONCURRENCY', 4))
+JOB_VISIBILITY_TIMEOUT_SECONDS = int(os.environ.get('JOB_VISIBILITY_TIMEOUT_SECONDS', 300))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 5))
+JOB_RETRY_BACKOFF_SECONDS = float(os.environ.get('JOB_RETRY_BACKOFF_SECONDS', 5))
+JOB_POLL_SECONDS = float(os.environ.get('JOB_POLL_SECONDS', 1))
+JOB_REAP_SECONDS = 30
+JOB_RETENTION_SECONDS = int(os.environ.get('JOB_RETENTION_SECONDS', 7 * 24 * 3600))
+JOB_DEAD_RETENTION_SECONDS = int(os.environ.get('JOB_DEAD_RETENTION_SECONDS', 30 * 24 * 3600))
+
+# Lead stats Config (0 disables the periodic reconciliation)
+STATS_RECONCILE_SECONDS = int(os.environ.get('STATS_RECONCILE_SECONDS', 3600))
+
+# Query plan audit: "off", "warn" (log COLLSCANs at startup) or "strict" (refuse to start)
+QUERY_PLAN_AUDIT = os.environ.get('QUERY_PLAN_AUDIT', 'off').lower()
+
+# Metrics Config (METRICS_TOKEN, when set, is required as a bearer token on /api/metrics)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+# Log requests slower than this with their DB/LLM/bcrypt breakdown (0 disables)
+SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 0))
+
+# ============ METRICS ============
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def format_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+class MetricCounter:
+    """Monotonic counter keyed by label values"""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.values = {}
+        # DB timings arrive from Motor's executor threads
+        self.lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for labels, value in self.values.items():
+                lines.append(f"{self.name}{format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values"""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            i = bisect.bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        with self.lock:
+            for labels, (counts, total, count) in self.series.items():
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    lines.append(f"{self.name}_bucket{format_labels(names, labels + (bound,))} {cumulative}")
+                lines.append(f"{self.name}_bucket{format_labels(names, labels + ('+Inf',))} {count}")
+                lines.append(f"{self.name}_sum{format_labels(self.labelnames, labels)} {total}")
+                lines.append(f"{self.name}_count{format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+class Gauge:
+    """Point-in-time value read from application state at scrape time"""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple, collect):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for labels, value in self.collect().items():
+            lines.append(f"{self.name}{format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+http_request_seconds = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status"))
+db_command_seconds = Histogram(
+    "db_command_duration_seconds", "MongoDB command latency by issuing route", ("route", "command", "outcome"))
+llm_request_seconds = Histogram(
+    "llm_request_duration_seconds", "Upstream LLM call latency per attempt", ("provider", "model", "mode", "outcome"))
+llm_tokens = MetricCounter(
+    "llm_tokens_total", "LLM tokens, estimated at 4 characters per token", ("provider", "model", "direction"))
+job_seconds = Histogram(
+    "job_duration_seconds", "Queued job run time per attempt", ("type", "outcome"))
+password_seconds = Histogram(
+    "password_hash_duration_seconds", "bcrypt job latency including pool queueing", ("operation",))
+
+# Per-request breakdown of time spent waiting on Mongo, the LLM and bcrypt
+request_timings = contextvars.ContextVar("request_timings", default=None)
+
+def route_label(scope: dict) -> str:
+    # Route templates, not raw paths, keep label cardinality bounded
+    route = scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+def current_route() -> str:
+    timings = request_timings.get()
+    return route_label(timings["scope"]) if timings is not None else "background"
+
+def record_timing(kind: str, seconds: float):
+    timings = request_timings.get()
+    if timings is not None:
+        timings[kind] += seconds
+        timings[f"{kind}_ops"] += 1
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+class DBCommandTimer(monitoring.CommandListener):
+    """Times Mongo commands; Motor copies the caller's context into its executor, so the route is known"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event, "ok")
+
+    def failed(self, event):
+        self._record(event, "error")
+
+    def _record(self, event, outcome: str):
+        seconds = event.duration_micros / 1_000_000
+        db_command_seconds.observe(seconds, current_route(), event.command_name, outcome)
+        record_timing("db", seconds)
+
+class MetricsMiddleware:
+    """Records per-route latency and logs slow requests with their DB/LLM/bcrypt breakdown"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        timings = {"scope": scope, "db": 0.0, "db_ops": 0, "llm": 0.0, "llm_ops": 0, "bcrypt": 0.0, "bcrypt_ops": 0}
+        token = request_timings.set(timings)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            request_timings.reset(token)
+            route = route_label(scope)
+            http_request_seconds.observe(elapsed, scope["method"], route, status_code)
+            if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+                logger.warning(
+                    f"Slow request {scope['method']} {route} {status_code} took {elapsed * 1000:.0f}ms "
+                    f"(db {timings['db'] * 1000:.0f}ms/{timings['db_ops']} ops, "
+                    f"llm {timings['llm'] * 1000:.0f}ms/{timings['llm_ops']} calls, "
+                    f"bcrypt {timings['bcrypt'] * 1000:.0f}ms)"
+                )
+
+# MongoDB connection
+mongo_url = os.environ['MONGO_URL']
+client = AsyncIOMotorClient(mongo_url, event_listeners=[DBCommandTimer()])
+db = client[os.environ['DB_NAME']]
 
 app = FastAPI()
 api_router = APIRouter(prefix="/api")
@@ -94,6 +395,15 @@ class LeadResponse(BaseModel):
     updated_at: str
     user_id: str
 
+class LeadCreateResponse(LeadResponse):
+    possible_duplicates: List[dict] = []
+
+class LeadBulkAction(BaseModel):
+    action: Literal["status", "delete", "reassign"]
+    lead_ids: List[str]
+    status: Optional[str] = None
+    assignee_email: Optional[EmailStr] = None
+
 class ContactCreate(BaseModel):
     lead_id: str
     name: str
@@ -145,23 +455,132 @@ class TemplateResponse(BaseModel):
     created_at: str
     user_id: str
 
+class TemplateRenderRequest(BaseModel):
+    lead_id: str
+    contact_id: Optional[str] = None
+    variables: dict = {}
+    personalize: bool = False
+
+class MailMergeRequest(BaseModel):
+    lead_ids: List[str] = []
+    contact_ids: List[str] = []
+    variables: dict = {}
+    personalize: bool = False
+
 class AIResearchRequest(BaseModel):
     company_name: str
     industry: Optional[str] = None
     additional_context: Optional[str] = None
+    lead_id: Optional[str] = None
+    force_refresh: bool = False
 
 class AIContactDiscoveryRequest(BaseModel):
     company_name: str
     lead_id: Optional[str] = None
+    force_refresh: bool = False
+
+class AIScoreRequest(BaseModel):
+    lead_ids: Optional[List[str]] = None
+    force: bool = False
+
+class JobCreate(BaseModel):
+    type: Literal["ai_research", "ai_discover_contacts", "ai_generate_email", "seed_leads", "lead_duplicates", "contact_duplicates", "ai_research_batch"]
+    payload: dict = {}
+    priority: int = Field(0, ge=-10, le=10)
+    max_attempts: Optional[int] = Field(None, ge=1, le=20)
+
+class GenerateEmailJob(BaseModel):
+    lead_id: str
+    template_id: Optional[str] = None
+    force_refresh: bool = False
+
+class SeedLeadsJob(BaseModel):
+    pass
+
+class FindDuplicatesJob(BaseModel):
+    pass
+
+class AIBatchResearchRequest(BaseModel):
+    lead_ids: List[str] = []
+    company_names: List[str] = []
+    force_refresh: bool = False
+
+# ============ CACHES ============
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def as_dict(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+# user_id -> user document, so authenticated requests skip the users lookup
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+user_cache_stats = CacheStats()
+
+# raw token -> (user_id, exp), so repeated requests skip signature verification
+token_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+token_cache_stats = CacheStats()
+
+# template id -> (subject, body, compiled subject, compiled body), so merges parse each template once
+template_cache = LRUCache(maxsize=TEMPLATE_CACHE_SIZE)
+template_cache_stats = CacheStats()
+
+def invalidate_user(user_id: str):
+    """Drop a cached user record; call after any write to db.users"""
+    user_cache.pop(user_id, None)
+
+def cache_stats() -> dict:
+    return {
+        "users": {**user_cache_stats.as_dict(), "size": len(user_cache)},
+        "tokens": {**token_cache_stats.as_dict(), "size": len(token_cache)},
+        "ai_responses": {**ai_cache_stats.as_dict(), "size": len(ai_cache)},
+        "templates": {**template_cache_stats.as_dict(), "size": len(template_cache)}
+    }
 
 # ============ AUTH HELPERS ============
 
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+# bcrypt releases the GIL, so a thread pool keeps hashing off the event loop
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+password_jobs_pending = 0
+
+async def run_password_job(fn, *args):
+    """Run bcrypt work on the password pool, failing fast once the queue is full"""
+    global password_jobs_pending
+    if password_jobs_pending >= PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many concurrent sign-ins, please retry",
+            headers={"Retry-After": "1"}
+        )
+    password_jobs_pending += 1
+    start = time.perf_counter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(password_executor, fn, *args)
+    finally:
+        password_jobs_pending -= 1
+        elapsed = time.perf_counter() - start
+        password_seconds.observe(elapsed, fn.__name__.strip("_"))
+        record_timing("bcrypt", elapsed)
 
-def verify_password(password: str, hashed: str) -> bool:
+def _hash_password(password: str) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
+
+def _verify_password(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
+async def hash_password(password: str) -> str:
+    return await run_password_job(_hash_password, password)
+
+async def verify_password(password: str, hashed: str) -> bool:
+    return await run_password_job(_verify_password, password, hashed)
+
 def create_token(user_id: str) -> str:
     payload = {
         "user_id": user_id,
@@ -169,18 +588,218 @@ def create_token(user_id: str) -> str:
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def decode_token(token: str) -> str:
+    """Return the user id carried by a token, memoizing successfully decoded tokens"""
+    if TOKEN_CACHE_ENABLED:
+        cached = token_cache.get(token)
+        if cached is not None:
+            user_id, exp = cached
+            if exp > datetime.now(timezone.utc).timestamp():
+                token_cache_stats.hits += 1
+                return user_id
+            token_cache.pop(token, None)
+            raise HTTPException(status_code=401, detail="Token expired")
+        token_cache_stats.misses += 1
     try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        user_id = payload.get("user_id")
-        user = await db.users.find_one({"id": user_id}, {"_id": 0})
-        if not user:
-            raise HTTPException(status_code=401, detail="User not found")
-        return user
+        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
+    user_id = payload.get("user_id")
+    if TOKEN_CACHE_ENABLED:
+        token_cache[token] = (user_id, payload["exp"])
+    return user_id
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    user_id = decode_token(credentials.credentials)
+    user = user_cache.get(user_id)
+    if user is not None:
+        user_cache_stats.hits += 1
+        return user
+    user_cache_stats.misses += 1
+    user = await db.users.find_one({"id": user_id}, {"_id": 0})
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+    user_cache[user_id] = user
+    return user
+
+# ============ PAGINATION HELPERS ============
+
+def encode_cursor(values: list) -> str:
+    raw = json.dumps(values, separators=(",", ":")).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip("=")
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        raw = base64.urlsafe_b64decode((cursor + "=" * (-len(cursor) % 4)).encode('ascii'))
+        values = json.loads(raw)
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != 2:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+def keyset_query(query: dict, sort_field: str, cursor: Optional[str]) -> dict:
+    """Restrict a query to documents after the cursor in (sort_field, id) descending order"""
+    if not cursor:
+        return query
+    value, last_id = decode_cursor(cursor)
+    # The values go straight into the filter, so anything but a timestamp and an id (an operator object) is refused
+    if not isinstance(value, str) or not isinstance(last_id, str):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {
+        **query,
+        "$or": [
+            {sort_field: {"$lt": value}},
+            {sort_field: value, "id": {"$lt": last_id}}
+        ]
+    }
+
+async def fetch_page(collection, query: dict, projection: dict, sort_field: str,
+                     cursor: Optional[str], limit: int, response: Response) -> List[dict]:
+    """Fetch one keyset page and advertise the next cursor in the X-Next-Cursor header"""
+    docs = await collection.find(keyset_query(query, sort_field, cursor), projection) \
+        .sort([(sort_field, -1), ("id", -1)]) \
+        .limit(limit + 1) \
+        .to_list(limit + 1)
+    if len(docs) > limit:
+        docs = docs[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor([docs[-1][sort_field], docs[-1]["id"]])
+    return docs
+
+def stream_ndjson(collection, query: dict, projection: dict, sort_field: str,
+                  cursor: Optional[str]) -> StreamingResponse:
+    """Stream every matching document as NDJSON straight from the Motor cursor"""
+    db_cursor = collection.find(keyset_query(query, sort_field, cursor), projection) \
+        .sort([(sort_field, -1), ("id", -1)]) \
+        .batch_size(STREAM_BATCH_SIZE)
+
+    async def generate():
+        async for doc in db_cursor:
+            yield orjson.dumps(doc) + b"\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+def list_projection(model, fields: Optional[str], *required: str) -> dict:
+    """Mongo projection for a list endpoint: the model's fields, or the requested subset of them"""
+    allowed = list(model.model_fields)
+    if not fields:
+        selected = allowed
+    else:
+        selected = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in selected if f not in allowed]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return {"_id": 0, **{field: 1 for field in (*required, *selected)}}
+
+def lean_response(docs: List[dict], response: Response) -> ORJSONResponse:
+    """Serialize trusted, already-projected DB documents without a Pydantic round trip"""
+    return ORJSONResponse(docs, headers=dict(response.headers))
+
+# ============ BULK WRITE HELPERS ============
+
+async def bulk_upsert(collection, ops: list):
+    """Run an unordered bulk_write and return (upserted op indexes, matched, write_errors), even on partial failure"""
+    try:
+        result = await collection.bulk_write(ops, ordered=False)
+        return sorted(result.upserted_ids), result.matched_count, []
+    except BulkWriteError as e:
+        upserted = sorted(u["index"] for u in e.details.get("upserted", []))
+        return upserted, e.details.get("nMatched", 0), e.details.get("writeErrors", [])
+
+def chunked(items: list, size: int = BULK_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+# None until the first transaction tells us whether the deployment supports them
+transactions_supported = None
+
+async def run_in_transaction(fn):
+    """Run fn(session) in a transaction, or with no session on a standalone mongod"""
+    global transactions_supported
+    if transactions_supported is not False:
+        try:
+            async with await client.start_session() as session:
+                result = await session.with_transaction(fn)
+            transactions_supported = True
+            return result
+        except OperationFailure as e:
+            # IllegalOperation: transactions need a replica set or mongos
+            if e.code != 20:
+                raise
+            transactions_supported = False
+            logger.warning("MongoDB transactions unavailable, cascades run without a transaction")
+    return await fn(None)
+
+LEAD_EXPORT_FIELDS = [
+    "id", "company_name", "industry", "company_size", "website", "status",
+    "notes", "qualification_score", "ai_insights", "created_at", "updated_at"
+]
+
+async def spool_request_body(request: Request):
+    """Copy the request body to a temp file that only stays in memory while small"""
+    spool = tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+def iter_import_rows(spool, file_format: str):
+    """Yield (row_number, row, error) for every record of a CSV or NDJSON upload"""
+    text = io.TextIOWrapper(spool, encoding='utf-8-sig', newline='')
+    if file_format == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            # Blank cells mean "not provided" rather than "clear this field"
+            yield reader.line_num, {k: v for k, v in row.items() if k and v not in (None, "")}, None
+        return
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"Invalid JSON: {str(e)}"
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, "Expected a JSON object"
+            continue
+        yield line_number, row, None
+
+def lead_upsert(lead: LeadCreate, user_id: str, now: str, company_name: Optional[str] = None) -> UpdateOne:
+    """Upsert keyed on (user_id, company_name), the row's own unless merging, that only overwrites the fields provided"""
+    provided = lead.model_dump(exclude_unset=True)
+    provided.pop("company_name", None)
+    defaults = {k: v for k, v in lead.model_dump().items() if k not in provided and k != "company_name"}
+    # The name keys follow the stored name, so only a new lead takes them from the row
+    keys = company_fields({"company_name": lead.company_name, "website": lead.website})
+    domain = {"website_domain": keys.pop("website_domain")} if "website" in provided else {}
+    # New leads always need scoring; existing ones only when a scored field changes; a supplied score is kept
+    manual = {"score_manual": True, "ai_score_pending": False} if "qualification_score" in provided else {}
+    rescore = {} if manual else {"ai_score_pending": True}
+    return UpdateOne(
+        {"user_id": user_id, "company_name": company_name or lead.company_name},
+        {
+            "$set": {**provided, **domain, "updated_at": now, **manual, **(rescore if SCORED_FIELDS & provided.keys() else {})},
+            "$setOnInsert": {
+                **defaults,
+                **keys,
+                "id": str(uuid.uuid4()),
+                "ai_insights": None,
+                "created_at": now,
+                **({} if SCORED_FIELDS & provided.keys() else rescore)
+            }
+        },
+        upsert=True
+    )
+
+def format_error(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
 
 # ============ AUTH ROUTES ============
 
@@ -194,11 +813,12 @@ async def register(data: UserCreate):
     user_doc = {
         "id": user_id,
         "email": data.email,
-        "password": hash_password(data.password),
+        "password": await hash_password(data.password),
         "name": data.name,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     await db.users.insert_one(user_doc)
+    invalidate_user(user_id)
     
     token = create_token(user_id)
     return TokenResponse(
@@ -209,7 +829,7 @@ async def register(data: UserCreate):
 @api_router.post("/auth/login", response_model=TokenResponse)
 async def login(data: UserLogin):
     user = await db.users.find_one({"email": data.email}, {"_id": 0})
-    if not user or not verify_password(data.password, user["password"]):
+    if not user or not await verify_password(data.password, user["password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     token = create_token(user["id"])
@@ -222,10 +842,677 @@ async def login(data: UserLogin):
 async def get_me(user: dict = Depends(get_current_user)):
     return UserResponse(id=user["id"], email=user["email"], name=user["name"], created_at=user["created_at"])
 
+# ============ LEAD STATS ============
+
+STAT_DIMENSIONS = ("status", "industry", "company_size")
+
+def stat_key(value) -> str:
+    # Counter names become field names, which must not contain "." or start with "$"
+    if value is None or value == "":
+        return "unknown"
+    return str(value).replace(".", "_").replace("$", "_")
+
+def lead_stat_deltas(lead: dict, sign: int = 1) -> Counter:
+    deltas = Counter({"total": sign})
+    for dimension in STAT_DIMENSIONS:
+        deltas[f"{dimension}.{stat_key(lead.get(dimension))}"] += sign
+    return deltas
+
+async def apply_lead_stats(user_id: str, deltas: Counter):
+    """Increment a user's materialized counters; users without counters are left to the fallback"""
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return
+    stats = await db.lead_stats.find_one_and_update(
+        {"user_id": user_id},
+        {"$inc": deltas, "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}},
+        {"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if stats:
+        publish_change(user_id, "lead_stats", "update", doc=stats)
+
+async def recompute_lead_stats(user_id: str) -> dict:
+    """Rebuild a user's counters from the leads collection"""
+    facets = {
+        dimension: [{"$group": {"_id": f"${dimension}", "count": {"$sum": 1}}}]
+        for dimension in STAT_DIMENSIONS
+    }
+    results = await db.leads.aggregate([
+        {"$match": {"user_id": user_id}},
+        {"$facet": facets}
+    ]).to_list(1)
+    stats = {"user_id": user_id, "total": 0, "updated_at": datetime.now(timezone.utc).isoformat()}
+    for dimension in STAT_DIMENSIONS:
+        counts = Counter()
+        for group in (results[0][dimension] if results else []):
+            counts[stat_key(group["_id"])] += group["count"]
+        stats[dimension] = dict(counts)
+    stats["total"] = sum(stats["status"].values())
+    await db.lead_stats.replace_one({"user_id": user_id}, stats, upsert=True)
+    publish_change(user_id, "lead_stats", "update", doc=stats)
+    return stats
+
+async def reconcile_lead_stats():
+    """Periodically recount every materialized stats document to correct any drift"""
+    while True:
+        await asyncio.sleep(STATS_RECONCILE_SECONDS)
+        try:
+            reconciled = 0
+            async for doc in db.lead_stats.find({}, {"_id": 0}):
+                stats = await recompute_lead_stats(doc["user_id"])
+                if any(stats.get(key) != doc.get(key) for key in ("total", *STAT_DIMENSIONS)):
+                    # Corrected counters change what the stats route returns
+                    await bump_versions(doc["user_id"], "leads")
+                reconciled += 1
+            logger.info(f"Reconciled lead stats for {reconciled} users")
+        except Exception as e:
+            logger.error(f"Lead stats reconciliation failed: {str(e)}")
+
+# ============ COLLECTION VERSIONS ============
+
+# Per-user counters, one per collection, advanced by every write that changes what a list or stats route returns
+VERSIONED_COLLECTIONS = ("leads", "contacts", "templates")
+
+async def bump_versions(user_id: str, *collections: str):
+    """Advance version stamps; call after the write so a stamp is never paired with older data"""
+    update = {"$inc": {collection: 1 for collection in collections}}
+    try:
+        await db.collection_versions.update_one({"user_id": user_id}, update, upsert=True)
+    except DuplicateKeyError:
+        # A concurrent first bump created the document
+        await db.collection_versions.update_one({"user_id": user_id}, update)
+
+async def conditional_get(request: Request, response: Response, user_id: str, *collections: str) -> Optional[Response]:
+    """Set an ETag from the user's version stamps; return a 304 if the client already has this version"""
+    versions = await db.collection_versions.find_one({"user_id": user_id}, {"_id": 0}) or {}
+    stamp = ",".join(f"{collection}:{versions.get(collection, 0)}" for collection in collections)
+    # The query string is part of the tag: other filters or pages of the same list are other representations
+    digest = hashlib.sha256(f"{user_id}|{stamp}|{request.url.path}?{request.url.query}".encode('utf-8')).hexdigest()
+    etag = f'W/"{digest[:32]}"'
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip() for tag in if_none_match.split(",")) or if_none_match.strip() == "*":
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+    return None
+
+# ============ CHANGE FEED ============
+
+# Lead, contact, template and lead stats changes pushed per user over /api/changes. Events come from a
+# MongoDB change stream where the deployment has one (replica set, pre-images for deletes), otherwise
+# from this process's own write paths.
+CHANGE_FEED_MODELS = {"leads": LeadResponse, "contacts": ContactResponse, "templates": TemplateResponse}
+CHANGE_FEED_COLLECTIONS = (*CHANGE_FEED_MODELS, "lead_stats")
+# Resume tokens are only meaningful to the process that issued them
+CHANGE_FEED_EPOCH = uuid.uuid4().hex[:12]
+# Resuming a change stream from a token that has left the oplog fails with these codes
+CHANGE_STREAM_HISTORY_LOST_CODES = {280, 286}
+
+class ReplayBuffer:
+    """A user's most recent events; since is the last sequence number that may be missing from it"""
+
+    def __init__(self, since: int):
+        self.since = since
+        self.events = deque(maxlen=CHANGE_FEED_REPLAY_SIZE)
+
+    def append(self, seq: int, event: dict):
+        if len(self.events) == self.events.maxlen:
+            self.since = self.events[0][0]
+        self.events.append((seq, event))
+
+    def after(self, seq: int) -> Optional[List[dict]]:
+        if seq < self.since:
+            return None
+        return [event for event_seq, event in self.events if event_seq > seq]
+
+class ChangeFeed:
+    """Fans change events out to each user's open sockets and keeps a replay buffer for reconnects"""
+
+    def __init__(self):
+        self.source = "memory"
+        self.seq = 0
+        self.subscribers = {}
+        # Only users who subscribed recently are buffered; anyone else resyncs on connect
+        self.replay = LRUCache(maxsize=CHANGE_FEED_REPLAY_USERS)
+
+    def token(self, seq: int) -> str:
+        return encode_cursor([CHANGE_FEED_EPOCH, seq])
+
+    def publish(self, user_id: str, event: dict):
+        queues = self.subscribers.get(user_id)
+        buffer = self.replay.get(user_id)
+        if not queues and buffer is None:
+            return
+        self.seq += 1
+        event = {"type": "change", "token": self.token(self.seq), **event}
+        if buffer is None:
+            buffer = self.replay[user_id] = ReplayBuffer(self.seq - 1)
+        buffer.append(self.seq, event)
+        for queue in queues or ():
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A client this far behind is cheaper to refetch than to catch up
+                self.resync(queue, event["token"])
+
+    def resync(self, queue: asyncio.Queue, token: str):
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait({"type": "resync", "token": token})
+
+    def resync_all(self):
+        token = self.token(self.seq)
+        self.replay.clear()
+        for queues in self.subscribers.values():
+            for queue in queues:
+                self.resync(queue, token)
+
+    def subscribe(self, user_id: str, resume: Optional[str]) -> tuple:
+        """Register a socket's queue; returns it with the token it starts from and the events to replay"""
+        queue = asyncio.Queue(maxsize=CHANGE_FEED_QUEUE_SIZE)
+        self.subscribers.setdefault(user_id, set()).add(queue)
+        buffer = self.replay.get(user_id)
+        if buffer is None:
+            buffer = self.replay[user_id] = ReplayBuffer(self.seq)
+        backlog = None
+        if resume:
+            try:
+                epoch, seq = decode_cursor(resume)
+            except HTTPException:
+                epoch, seq = None, None
+            if epoch == CHANGE_FEED_EPOCH and isinstance(seq, int):
+                backlog = buffer.after(seq)
+        return queue, self.token(self.seq), backlog
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue):
+        queues = self.subscribers.get(user_id, set())
+        queues.discard(queue)
+        if not queues:
+            self.subscribers.pop(user_id, None)
+
+change_feed = ChangeFeed()
+
+def change_event(collection: str, op: str, doc_id: Optional[str] = None, doc: Optional[dict] = None,
+                 fields: Optional[dict] = None, removed: Optional[List[str]] = None) -> Optional[dict]:
+    """A change as the list routes would show it, or None when no client-visible field changed"""
+    event = {"collection": collection, "op": op}
+    if doc_id:
+        event["id"] = doc_id
+    if collection == "lead_stats":
+        event["doc"] = lead_stats_summary(doc)
+        return event
+    visible = CHANGE_FEED_MODELS[collection].model_fields
+    if doc is not None:
+        event["doc"] = {k: v for k, v in doc.items() if k in visible}
+    if fields is not None or removed is not None:
+        # Update paths may be dotted; the top-level field decides visibility
+        event["fields"] = {k: v for k, v in (fields or {}).items() if k.split(".")[0] in visible}
+        event["removed"] = [k for k in (removed or []) if k.split(".")[0] in visible]
+        if not event["fields"] and not event["removed"]:
+            return None
+    return event
+
+def publish_change(user_id: str, collection: str, op: str, doc_id: Optional[str] = None,
+                   doc: Optional[dict] = None, fields: Optional[dict] = None):
+    """Publish a write made by this process; while a change stream runs, it reports the write instead"""
+    if change_feed.source == "change_stream":
+        return
+    event = change_event(collection, op, doc_id, doc, fields)
+    if event:
+        change_feed.publish(user_id, event)
+
+def stream_events(change: dict) -> List[tuple]:
+    """Map a change stream document to (user_id, event) pairs"""
+    collection = change["ns"]["coll"]
+    op = change["operationType"]
+    after = change.get("fullDocument")
+    before = change.get("fullDocumentBeforeChange")
+    if collection == "lead_stats":
+        return [(after["user_id"], change_event(collection, "update", doc=after))] if after else []
+    owner = after or before
+    if not owner or not owner.get("user_id"):
+        # A delete without a pre-image, or an update to a document deleted before the lookup
+        return []
+    if op == "insert":
+        return [(owner["user_id"], change_event(collection, "insert", owner["id"], doc=after))]
+    if op == "delete":
+        return [(owner["user_id"], change_event(collection, "delete", owner["id"]))]
+    if after and before and before.get("user_id") != after.get("user_id"):
+        # Re-assigned: it leaves one user's lists and enters another's
+        return [
+            (before["user_id"], change_event(collection, "delete", before["id"])),
+            (after["user_id"], change_event(collection, "insert", after["id"], doc=after))
+        ]
+    if op == "replace":
+        event = change_event(collection, "update", owner["id"], fields=after)
+    else:
+        description = change.get("updateDescription", {})
+        event = change_event(collection, "update", owner["id"], fields=description.get("updatedFields"),
+                             removed=description.get("removedFields"))
+    return [(owner["user_id"], event)] if event else []
+
+def watch_changes(resume_after=None):
+    pipeline = [{"$match": {
+        "ns.coll": {"$in": list(CHANGE_FEED_COLLECTIONS)},
+        "operationType": {"$in": ["insert", "update", "replace", "delete"]}
+    }}]
+    return db.watch(pipeline, full_document="updateLookup", full_document_before_change="whenAvailable",
+                    resume_after=resume_after)
+
+async def open_change_stream():
+    """Enable pre-images and open the change stream, or return None where the deployment has no change streams"""
+    try:
+        for name in CHANGE_FEED_MODELS:
+            await db.command("collMod", name, changeStreamPreAndPostImages={"enabled": True})
+        stream = watch_changes()
+        # Opens the cursor, which is where a standalone mongod refuses; nobody is subscribed to miss a change yet
+        await stream.try_next()
+        return stream
+    except OperationFailure as e:
+        logger.info(f"Change streams unavailable, change feed only sees this process's writes: {str(e)}")
+    except Exception as e:
+        logger.warning(f"Could not open change stream, change feed only sees this process's writes: {str(e)}")
+    return None
+
+async def run_change_stream(stream):
+    resume_token = stream.resume_token
+    while True:
+        try:
+            async with stream:
+                async for change in stream:
+                    resume_token = stream.resume_token
+                    for user_id, event in stream_events(change):
+                        change_feed.publish(user_id, event)
+        except OperationFailure as e:
+            logger.warning(f"Change stream interrupted: {str(e)}")
+            if e.code in CHANGE_STREAM_HISTORY_LOST_CODES:
+                # Events since the token are gone; start fresh and have every client refetch
+                resume_token = None
+                change_feed.resync_all()
+        except Exception as e:
+            logger.warning(f"Change stream interrupted: {str(e)}")
+        await asyncio.sleep(1)
+        stream = watch_changes(resume_token)
+
+async def wait_for_disconnect(websocket: WebSocket):
+    # Clients only listen; reading is how a close from their side is noticed
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
+async def authenticate_socket(websocket: WebSocket) -> dict:
+    """Read the JWT from the first message, so it never appears in a URL or an access log"""
+    try:
+        message = await asyncio.wait_for(websocket.receive_text(), timeout=CHANGE_FEED_AUTH_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=401, detail="Authentication timed out")
+    try:
+        message = orjson.loads(message)
+    except orjson.JSONDecodeError:
+        message = None
+    if not isinstance(message, dict) or message.get("type") != "auth" or not isinstance(message.get("token"), str):
+        raise HTTPException(status_code=401, detail='First message must be {"type": "auth", "token": "<jwt>"}')
+    return await get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=message["token"]))
+
+@api_router.websocket("/changes")
+async def change_feed_socket(
+    websocket: WebSocket,
+    resume: Optional[str] = None,
+    collections: Optional[str] = None
+):
+    """Push the user's changes; a reconnect passing the last token replays what it missed if it still can"""
+    wanted = set(c.strip() for c in collections.split(",") if c.strip()) if collections else set(CHANGE_FEED_COLLECTIONS)
+    unknown = wanted - set(CHANGE_FEED_COLLECTIONS)
+    if unknown:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=f"Unknown collections: {', '.join(sorted(unknown))}")
+        return
+
+    await websocket.accept()
+    try:
+        user = await authenticate_socket(websocket)
+    except HTTPException as e:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=e.detail)
+        return
+    except WebSocketDisconnect:
+        return
+    queue, start_token, backlog = change_feed.subscribe(user["id"], resume)
+
+    async def send(event: dict):
+        if "collection" not in event or event["collection"] in wanted:
+            await websocket.send_text(orjson.dumps(event).decode('utf-8'))
+
+    async def pump():
+        for event in backlog or ():
+            await send(event)
+        # resumed=false means events may have been missed and the client should refetch
+        await send({"type": "ready", "token": start_token, "resumed": backlog is not None, "source": change_feed.source})
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=CHANGE_FEED_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                event = {"type": "ping"}
+            await send(event)
+
+    tasks = [asyncio.create_task(pump()), asyncio.create_task(wait_for_disconnect(websocket))]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        change_feed.unsubscribe(user["id"], queue)
+        for task in tasks:
+            task.cancel()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception) and not isinstance(result, WebSocketDisconnect):
+            logger.warning(f"Change feed socket closed with an error: {str(result)}")
+
+# ============ COMPANY MATCHING ============
+
+# Normalized match fields stored on every lead: an exact company key, the website's domain and MinHash
+# LSH band hashes over the key's trigrams, which find near-duplicate names through a multikey index
+LEGAL_SUFFIXES = frozenset({
+    "inc", "incorporated", "corp", "corporation", "co", "company", "llc", "llp", "lp", "ltd", "limited",
+    "plc", "gmbh", "ag", "kg", "sa", "sas", "sarl", "srl", "spa", "bv", "nv", "oy", "ab", "pty", "pte", "pvt",
+})
+# Second-level labels under country domains: acme.co.uk is acme's, not co's
+SECOND_LEVEL_LABELS = frozenset({"co", "com", "org", "net", "ac", "gov", "edu"})
+# Hosts serving many companies' pages, where only the path says whose page it is
+SHARED_WEBSITE_HOSTS = frozenset({
+    "linkedin.com", "facebook.com", "fb.com", "instagram.com", "twitter.com", "x.com", "youtube.com",
+    "tiktok.com", "pinterest.com", "github.com", "gitlab.com", "medium.com", "sites.google.com", "google.com",
+    "linktr.ee", "crunchbase.com", "angel.co", "wellfound.com", "yelp.com", "about.me", "notion.so", "bit.ly",
+})
+URL_SCHEME_PATTERN = re.compile(r"^[a-z][a-z0-9+.-]*://")
+DOMAIN_NAME_PATTERN = re.compile(r"^(?:https?://)?(?:www\.)?[a-z0-9-]+(?:\.[a-z0-9-]+)+/?$")
+INITIALISM_PATTERN = re.compile(r"\b(?:[a-z0-9] )+[a-z0-9]\b")
+LEAD_MATCH_PROJECTION = {"_id": 0, "id": 1, "company_name": 1, "company_key": 1, "website_domain": 1, "company_lsh": 1}
+LEAD_MATCH_MAX_CANDIDATES = 200
+# Similar-name candidates fetched per imported row; a crowded band beyond this only loses "possible duplicate" flags
+LEAD_IMPORT_CANDIDATES_PER_ROW = 20
+
+# Banding trades recall for candidate count: names with trigram similarity 0.6 collide in some band
+# ~95% of the time, unrelated names almost never. Changing these or the salt invalidates stored hashes.
+MINHASH_BANDS = 12
+MINHASH_ROWS = 3
+MINHASH_SALT = b"spinmr-company-minhash:"
+MINHASH_HASHES = struct.Struct(f">{MINHASH_BANDS * MINHASH_ROWS}I")
+MINHASH_BAND = struct.Struct(f">B{MINHASH_ROWS}I")
+
+def website_host(website: Optional[str]) -> Optional[str]:
+    if not website:
+        return None
+    value = URL_SCHEME_PATTERN.sub("", website.strip().lower())
+    value = re.split(r"[/?#]", value, 1)[0].rsplit("@", 1)[-1].split(":", 1)[0].strip(".")
+    if value.startswith("www."):
+        value = value[4:]
+    return value if "." in value else None
+
+def normalize_domain(website: Optional[str]) -> Optional[str]:
+    """A website's identity: its host, or host and path on a shared host such as linkedin.com/company/acme"""
+    host = website_host(website)
+    # The most specific entry wins, so sites.google.com is not folded into google.com
+    shared = max((h for h in SHARED_WEBSITE_HOSTS if host and (host == h or host.endswith("." + h))), key=len, default=None)
+    if not shared:
+        return host
+    parts = urlsplit("//" + URL_SCHEME_PATTERN.sub("", website.strip().lower()))
+    path = "/".join(segment for segment in parts.path.split("/") if segment)
+    if parts.query:
+        path += "?" + parts.query
+    # The bare host is everyone's; it says nothing about the company
+    return f"{shared}/{path}" if path else None
+
+def domain_label(domain: str) -> str:
+    """The registrable name in a domain: acme.com, acme.co.uk and shop.acme.com all give acme"""
+    labels = domain.split(".")[:-1]
+    if len(labels) > 1 and labels[-1] in SECOND_LEVEL_LABELS:
+        labels = labels[:-1]
+    return labels[-1]
+
+def normalize_company(name: Optional[str]) -> Optional[str]:
+    """Fold case, accents, punctuation and legal suffixes, so "ACME, Inc.", "Acme Inc" and "acme.com" all give "acme\""""
+    if not name:
+        return None
+    value = unicodedata.normalize("NFKD", name.strip().lower())
+    value = "".join(ch for ch in value if not unicodedata.combining(ch))
+    if DOMAIN_NAME_PATTERN.match(value):
+        value = domain_label(website_host(value))
+    value = value.replace("&", " and ").replace("'", "").replace("’", "")
+    tokens = re.sub(r"[^a-z0-9]+", " ", value).strip()
+    # "I.B.M." and "L.L.C." become single tokens before suffixes are looked up
+    tokens = INITIALISM_PATTERN.sub(lambda m: m.group(0).replace(" ", ""), tokens).split()
+    if len(tokens) > 1 and tokens[0] == "the":
+        tokens = tokens[1:]
+    while len(tokens) > 1 and (tokens[-1] in LEGAL_SUFFIXES or tokens[-1] == "and"):
+        tokens.pop()
+    # Names with no latin letters or digits still get a key
+    return "".join(tokens) or re.sub(r"\s+", "", value) or None
+
+def company_trigrams(key: str) -> set:
+    padded = f"${key}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def company_similarity(a: str, b: str) -> float:
+    """Jaccard similarity of two company keys' trigram sets"""
+    x, y = company_trigrams(a), company_trigrams(b)
+    return len(x & y) / len(x | y)
+
+@functools.lru_cache(maxsize=65536)
+def trigram_hashes(trigram: str) -> tuple:
+    """One 32-bit hash per MinHash function; the trigram vocabulary is small, so these are nearly always cached"""
+    return MINHASH_HASHES.unpack(hashlib.shake_128(MINHASH_SALT + trigram.encode('utf-8')).digest(MINHASH_HASHES.size))
+
+def minhash_bands(key: str) -> List[int]:
+    signature = list(map(min, zip(*map(trigram_hashes, company_trigrams(key)))))
+    bands = []
+    for band in range(MINHASH_BANDS):
+        packed = MINHASH_BAND.pack(band, *signature[band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS])
+        # 56 bits keeps the value a positive int64; packing the band number keeps bands from colliding
+        bands.append(int.from_bytes(hashlib.blake2b(packed, digest_size=7).digest(), "big"))
+    return bands
+
+def company_fields(fields: dict) -> dict:
+    """Normalized match fields for whichever of company_name and website are present in fields"""
+    keys = {}
+    if "company_name" in fields:
+        keys["company_key"] = normalize_company(fields["company_name"])
+        keys["company_lsh"] = minhash_bands(keys["company_key"]) if keys["company_key"] else []
+    if "website" in fields:
+        keys["website_domain"] = normalize_domain(fields["website"])
+    return keys
+
+def lead_duplicate_query(user_id: str, keys: List[dict], exact: bool = True, similar: bool = True) -> Optional[dict]:
+    """One indexed lookup for every lead that could duplicate any of keys"""
+    clauses = []
+    company_keys = sorted({k["company_key"] for k in keys if k.get("company_key")})
+    domains = sorted({k["website_domain"] for k in keys if k.get("website_domain")})
+    bands = sorted({band for k in keys for band in k.get("company_lsh", ())})
+    if exact and company_keys:
+        clauses.append({"company_key": {"$in": company_keys}})
+    if exact and domains:
+        clauses.append({"website_domain": {"$in": domains}})
+    if similar and bands:
+        clauses.append({"company_lsh": {"$in": bands}})
+    return {"user_id": user_id, "$or": clauses} if clauses else None
+
+def match_lead(keys: dict, candidate: dict) -> Optional[dict]:
+    """How candidate matches keys: same company key, a similar name or the same website domain"""
+    similarity = 0.0
+    if keys.get("company_key") and candidate.get("company_key"):
+        similarity = company_similarity(keys["company_key"], candidate["company_key"])
+    if keys.get("company_key") and candidate.get("company_key") == keys["company_key"]:
+        matched_on, similarity = "company", 1.0
+    elif similarity >= LEAD_MATCH_THRESHOLD:
+        matched_on = "similar_name"
+    elif keys.get("website_domain") and candidate.get("website_domain") == keys["website_domain"]:
+        matched_on = "domain"
+    else:
+        return None
+    return {
+        "lead_id": candidate.get("id"),
+        "company_name": candidate["company_name"],
+        "matched_on": matched_on,
+        "similarity": round(similarity, 3)
+    }
+
+async def find_lead_duplicates(user_id: str, keys: dict) -> List[dict]:
+    """Existing leads matching keys, best match first"""
+    query = lead_duplicate_query(user_id, [keys])
+    if not query:
+        return []
+    exact = [{"$eq": [f"${field}", keys[field]]} for field in ("company_key", "website_domain") if keys.get(field)]
+    # Exact matches first, then by shared bands, which grow with name similarity; crowded bands are cut off
+    candidates = await db.leads.aggregate([
+        {"$match": query},
+        {"$addFields": {
+            "exact_match": {"$or": exact} if exact else False,
+            "shared_bands": {"$size": {"$filter": {
+                "input": {"$ifNull": ["$company_lsh", []]},
+                "cond": {"$in": ["$$this", keys.get("company_lsh", [])]}
+            }}}
+        }},
+        {"$sort": {"exact_match": -1, "shared_bands": -1}},
+        {"$limit": LEAD_MATCH_MAX_CANDIDATES},
+        {"$project": LEAD_MATCH_PROJECTION},
+    ]).to_list(LEAD_MATCH_MAX_CANDIDATES)
+    matches = [match for match in (match_lead(keys, c) for c in candidates) if match]
+    return sorted(matches, key=lambda m: -m["similarity"])
+
+def lead_duplicate_detail(match: dict) -> str:
+    lead = f"lead {match['lead_id']}" if match["lead_id"] else "a lead earlier in this import"
+    if match["matched_on"] == "similar_name":
+        return f"Possible duplicate of {lead} ({match['company_name']}, similarity {match['similarity']})"
+    if match["matched_on"] == "domain":
+        return f"Possible duplicate of {lead} ({match['company_name']}, same website)"
+    return f"Duplicate of {lead} ({match['company_name']}, same company)"
+
+class LeadMatchIndex:
+    """In-memory lookup over a batch's candidate leads and the rows already accepted from it"""
+
+    def __init__(self, candidates: List[dict]):
+        self.by_name = {}
+        self.by_key = {}
+        self.by_domain = {}
+        self.by_band = {}
+        for candidate in candidates:
+            self.add(candidate, candidate.get("company_lsh", []))
+
+    def add(self, lead: dict, bands: List[int]):
+        self.by_name.setdefault(lead["company_name"], lead)
+        if lead.get("company_key"):
+            self.by_key.setdefault(lead["company_key"], lead)
+        if lead.get("website_domain"):
+            self.by_domain.setdefault(lead["website_domain"], lead)
+        for band in bands:
+            self.by_band.setdefault(band, []).append(lead)
+
+    def match(self, keys: dict) -> Optional[dict]:
+        exact = self.by_key.get(keys.get("company_key"))
+        if exact:
+            return match_lead(keys, exact)
+        similar = {id(lead): lead for band in keys.get("company_lsh", ()) for lead in self.by_band.get(band, ())}
+        same_site = self.by_domain.get(keys.get("website_domain"))
+        if same_site:
+            similar[id(same_site)] = same_site
+        matches = [match for match in (match_lead(keys, lead) for lead in similar.values()) if match]
+        return max(matches, key=lambda m: m["similarity"], default=None)
+
+async def backfill_company_keys(user_id: Optional[str] = None) -> int:
+    """Add match fields to leads created before they existed, in one pass over the collection"""
+    # Leads saved before shared hosts were recognised carry the bare host (linkedin.com) as their domain
+    query = {"$or": [{"company_key": {"$exists": False}}, {"website_domain": {"$in": sorted(SHARED_WEBSITE_HOSTS)}}]}
+    if user_id:
+        query["user_id"] = user_id
+    updated = 0
+    ops = []
+    async for lead in db.leads.find(query, {"_id": 0, "id": 1, "company_name": 1, "website": 1}):
+        ops.append(UpdateOne({"id": lead["id"]}, {"$set": company_fields({"website": None, **lead})}))
+        if len(ops) >= LEAD_DEDUP_BACKFILL_BATCH:
+            await db.leads.bulk_write(ops, ordered=False)
+            updated += len(ops)
+            ops = []
+    if ops:
+        await db.leads.bulk_write(ops, ordered=False)
+        updated += len(ops)
+    return updated
+
+async def backfill_all_company_keys():
+    try:
+        updated = await backfill_company_keys()
+        if updated:
+            logger.info(f"Added company match fields to {updated} leads")
+    except Exception as e:
+        logger.error(f"Company match field backfill failed: {str(e)}")
+
+LEAD_DEDUP_BLOCKS = {
+    "company": "$company_key",
+    "domain": "$website_domain",
+}
+
+async def similar_name_edges(user_id: str) -> tuple:
+    """Near-duplicate pairs from leads sharing an LSH band, verified by their real trigram similarity"""
+    pipeline = [
+        {"$match": {"user_id": user_id, "company_key": {"$nin": [None, ""]}}},
+        {"$unwind": "$company_lsh"},
+        {"$group": {"_id": "$company_lsh", "leads": {"$push": {"id": "$id", "key": "$company_key"}}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    edges = []
+    compared = set()
+    skipped = 0
+    async for bucket in db.leads.aggregate(pipeline, allowDiskUse=True):
+        if bucket["count"] > LEAD_DEDUP_MAX_BUCKET:
+            # A band shared by this many names is noise; exact keys still catch real duplicates in it
+            skipped += 1
+            continue
+        by_key = {}
+        for lead in bucket["leads"]:
+            by_key.setdefault(lead["key"], lead["id"])
+        keys = sorted(by_key)
+        for i, a in enumerate(keys):
+            for b in keys[i + 1:]:
+                # The same pair shares several bands; score it once
+                if (a, b) in compared:
+                    continue
+                compared.add((a, b))
+                if company_similarity(a, b) >= LEAD_MATCH_THRESHOLD:
+                    edges.append(("similar_name", [by_key[a], by_key[b]]))
+    return edges, skipped
+
+async def find_lead_duplicate_clusters(user_id: str) -> dict:
+    """Cluster the user's leads sharing a company key or website domain, or with similar names"""
+    backfilled = await backfill_company_keys(user_id)
+    edges = []
+    for block, key in LEAD_DEDUP_BLOCKS.items():
+        async for ids in duplicate_groups(db.leads, user_id, key):
+            edges.append((block, ids))
+    similar, skipped = await similar_name_edges(user_id)
+    clusters = sorted(cluster_duplicates(edges + similar, "lead_ids"), key=lambda c: -c["size"])
+    return {
+        "backfilled": backfilled,
+        "total": len(clusters),
+        "duplicate_leads": sum(c["size"] for c in clusters),
+        "skipped_buckets": skipped,
+        "clusters": clusters[:LEAD_DEDUP_MAX_CLUSTERS],
+        "clusters_truncated": len(clusters) > LEAD_DEDUP_MAX_CLUSTERS
+    }
+
 # ============ LEADS ROUTES ============
 
-@api_router.post("/leads", response_model=LeadResponse)
-async def create_lead(data: LeadCreate, user: dict = Depends(get_current_user)):
+@api_router.post("/leads", response_model=LeadCreateResponse, status_code=201)
+async def create_lead(
+    data: LeadCreate,
+    on_duplicate: Literal["reject", "allow"] = "reject",
+    user: dict = Depends(get_current_user)
+):
+    """Create a lead; one with an existing lead's normalized name is a 409, similar names and websites are only flagged"""
+    keys = company_fields(data.model_dump())
+    possible_duplicates = []
+    if on_duplicate == "reject":
+        matches = await find_lead_duplicates(user["id"], keys)
+        same_company = next((match for match in matches if match["matched_on"] == "company"), None)
+        if same_company:
+            raise HTTPException(status_code=409, detail=lead_duplicate_detail(same_company))
+        # Similar names and shared websites may well be different companies, as on import
+        possible_duplicates = matches
     lead_id = str(uuid.uuid4())
     now = datetime.now(timezone.utc).isoformat()
     lead_doc = {
@@ -238,21 +1525,275 @@ async def create_lead(data: LeadCreate, user: dict = Depends(get_current_user)):
         "notes": data.notes,
         "qualification_score": data.qualification_score,
         "ai_insights": None,
+        # A score the rep typed in is never replaced by the AI one
+        "ai_score_pending": data.qualification_score is None,
+        "score_manual": data.qualification_score is not None,
+        **keys,
         "created_at": now,
         "updated_at": now,
         "user_id": user["id"]
     }
-    await db.leads.insert_one(lead_doc)
-    lead_doc.pop("_id", None)
-    return LeadResponse(**lead_doc)
+    try:
+        result = await db.leads.update_one(
+            {"user_id": user["id"], "company_name": data.company_name},
+            {"$setOnInsert": lead_doc},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        result = None
+    if result is None or result.upserted_id is None:
+        raise HTTPException(status_code=409, detail="A lead for this company already exists")
+    await apply_lead_stats(user["id"], lead_stat_deltas(lead_doc))
+    await bump_versions(user["id"], "leads")
+    publish_change(user["id"], "leads", "insert", lead_id, doc=lead_doc)
+    scoring_wakeup.set()
+    return LeadCreateResponse(**lead_doc, possible_duplicates=possible_duplicates)
 
 @api_router.get("/leads", response_model=List[LeadResponse])
-async def get_leads(status: Optional[str] = None, user: dict = Depends(get_current_user)):
+async def get_leads(
+    request: Request,
+    response: Response,
+    status: Optional[str] = None,
+    ids: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(LIST_PAGE_SIZE, ge=1, le=LIST_PAGE_SIZE_MAX),
+    stream: bool = False,
+    fields: Optional[str] = None,
+    user: dict = Depends(get_current_user)
+):
+    query = {"user_id": user["id"]}
+    if status:
+        query["status"] = status
+    if ids:
+        # Lets a page of contacts fetch just the leads it shows
+        lead_ids = list(dict.fromkeys(i.strip() for i in ids.split(",") if i.strip()))
+        if len(lead_ids) > LIST_PAGE_SIZE_MAX:
+            raise HTTPException(status_code=400, detail=f"At most {LIST_PAGE_SIZE_MAX} ids per request")
+        query["id"] = {"$in": lead_ids}
+    projection = list_projection(LeadResponse, fields, "id", "updated_at")
+    if stream:
+        return stream_ndjson(db.leads, query, projection, "updated_at", cursor)
+    not_modified = await conditional_get(request, response, user["id"], "leads")
+    if not_modified:
+        return not_modified
+    leads = await fetch_page(db.leads, query, projection, "updated_at", cursor, limit, response)
+    return lean_response(leads, response)
+
+LEAD_SEARCH_SORTS = ("relevance", "updated_at", "created_at", "company_name", "qualification_score")
+
+def to_utc_iso(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat()
+
+@api_router.get("/leads/search", response_model=List[LeadResponse])
+async def search_leads(
+    request: Request,
+    response: Response,
+    q: Optional[str] = None,
+    status: Optional[str] = None,
+    industry: Optional[str] = None,
+    company_size: Optional[str] = None,
+    min_score: Optional[int] = None,
+    max_score: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    sort: str = Query("relevance", pattern=f"^({'|'.join(LEAD_SEARCH_SORTS)})$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    cursor: Optional[str] = None,
+    limit: int = Query(LIST_PAGE_SIZE, ge=1, le=LIST_PAGE_SIZE_MAX),
+    fields: Optional[str] = None,
+    user: dict = Depends(get_current_user)
+):
+    """Full-text search over company name, notes and AI insights with filters and sorting"""
     query = {"user_id": user["id"]}
+    if q and q.strip():
+        query["$text"] = {"$search": q.strip()}
     if status:
         query["status"] = status
-    leads = await db.leads.find(query, {"_id": 0}).sort("updated_at", -1).to_list(1000)
-    return [LeadResponse(**lead) for lead in leads]
+    if industry:
+        query["industry"] = industry
+    if company_size:
+        query["company_size"] = company_size
+    if min_score is not None or max_score is not None:
+        query["qualification_score"] = {}
+        if min_score is not None:
+            query["qualification_score"]["$gte"] = min_score
+        if max_score is not None:
+            query["qualification_score"]["$lte"] = max_score
+    if created_from or created_to:
+        query["created_at"] = {}
+        if created_from:
+            query["created_at"]["$gte"] = to_utc_iso(created_from)
+        if created_to:
+            query["created_at"]["$lte"] = to_utc_iso(created_to)
+
+    direction = -1 if order == "desc" else 1
+    if sort == "relevance" and "$text" in query:
+        sort_spec = [("score", {"$meta": "textScore"}), ("id", 1)]
+    else:
+        sort_field = "updated_at" if sort == "relevance" else sort
+        sort_spec = [(sort_field, direction), ("id", direction)]
+
+    # Arbitrary sort keys (text score, nullable scores) make keyset cursors ambiguous,
+    # so search pages carry an offset inside the same opaque cursor format
+    offset = 0
+    if cursor:
+        kind, offset = decode_cursor(cursor)
+        if kind != "offset" or not isinstance(offset, int) or offset < 0:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    not_modified = await conditional_get(request, response, user["id"], "leads")
+    if not_modified:
+        return not_modified
+    leads = await db.leads.find(query, list_projection(LeadResponse, fields, "id")) \
+        .sort(sort_spec) \
+        .skip(offset) \
+        .limit(limit + 1) \
+        .to_list(limit + 1)
+    if len(leads) > limit:
+        leads = leads[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(["offset", offset + limit])
+    return lean_response(leads, response)
+
+@api_router.post("/leads/import")
+async def import_leads(
+    request: Request,
+    file_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    batch_size: int = Query(IMPORT_BATCH_SIZE, ge=1, le=10000),
+    on_duplicate: Literal["merge", "reject", "allow"] = "merge",
+    user: dict = Depends(get_current_user)
+):
+    """Bulk upsert leads from a CSV or NDJSON body, merging duplicates and reporting per-row errors"""
+    report = {
+        "processed": 0, "created": 0, "updated": 0, "merged": 0, "failed": 0, "errors": [], "errors_truncated": False,
+        "possible_duplicates": [], "possible_duplicates_truncated": False
+    }
+    batch = []
+
+    async def flush():
+        if not batch:
+            return
+        keys = [company_fields({"company_name": lead.company_name, "website": lead.website}) for _, lead in batch]
+        index = None
+        if on_duplicate != "allow":
+            # Two lookups per batch; rows accepted from the batch join the index so later rows match them too
+            candidates = {}
+            exact_query = lead_duplicate_query(user["id"], keys, similar=False)
+            if exact_query:
+                for lead in await db.leads.find(exact_query, LEAD_MATCH_PROJECTION).to_list(None):
+                    candidates[lead["id"]] = lead
+            similar_query = lead_duplicate_query(user["id"], keys, exact=False)
+            if similar_query:
+                limit = len(batch) * LEAD_IMPORT_CANDIDATES_PER_ROW
+                for lead in await db.leads.find(similar_query, LEAD_MATCH_PROJECTION).limit(limit).to_list(limit):
+                    candidates.setdefault(lead["id"], lead)
+            index = LeadMatchIndex(list(candidates.values()))
+        ops = []
+        op_rows = []
+        for (row_number, lead), row_keys in zip(batch, keys):
+            target = None
+            if index is not None and lead.company_name not in index.by_name:
+                match = index.match(row_keys)
+                if match and match["matched_on"] == "company":
+                    if on_duplicate == "reject":
+                        record_error(row_number, lead_duplicate_detail(match))
+                        continue
+                    target = match["company_name"]
+                else:
+                    if match:
+                        # Similar names and shared websites are only flagged; they may well be different companies
+                        record_possible_duplicate(row_number, lead.company_name, match)
+                    index.add({"company_name": lead.company_name, **row_keys}, row_keys["company_lsh"])
+            ops.append(lead_upsert(lead, user["id"], now, target))
+            op_rows.append((row_number, "merged" if target else "updated"))
+        batch.clear()
+        if not ops:
+            return
+        upserted, _, write_errors = await bulk_upsert(db.leads, ops)
+        # Every written row lands in exactly one of created, updated, merged or failed
+        upserted = set(upserted)
+        failed_ops = {err["index"]: err.get("errmsg", "Write failed") for err in write_errors}
+        for i, (row_number, outcome) in enumerate(op_rows):
+            if i in failed_ops:
+                record_error(row_number, failed_ops[i])
+            else:
+                report["created" if i in upserted else outcome] += 1
+
+    def record_possible_duplicate(row_number: int, company_name: str, match: dict):
+        if len(report["possible_duplicates"]) < IMPORT_MAX_ERRORS:
+            report["possible_duplicates"].append({"row": row_number, "company_name": company_name, "duplicate_of": match})
+        else:
+            report["possible_duplicates_truncated"] = True
+
+    def record_error(row_number: int, message: str):
+        report["failed"] += 1
+        if len(report["errors"]) < IMPORT_MAX_ERRORS:
+            report["errors"].append({"row": row_number, "error": message})
+        else:
+            report["errors_truncated"] = True
+
+    spool = await spool_request_body(request)
+    try:
+        now = datetime.now(timezone.utc).isoformat()
+        for row_number, row, error in iter_import_rows(spool, file_format):
+            report["processed"] += 1
+            if error:
+                record_error(row_number, error)
+                continue
+            try:
+                lead = LeadCreate(**row)
+            except ValidationError as e:
+                record_error(row_number, format_error(e))
+                continue
+            batch.append((row_number, lead))
+            if len(batch) >= batch_size:
+                await flush()
+        await flush()
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Upload must be UTF-8 encoded")
+    except csv.Error as e:
+        raise HTTPException(status_code=400, detail=f"Malformed CSV: {str(e)}")
+    finally:
+        spool.close()
+    # Upserts may have moved leads between statuses, so recount rather than diff
+    await recompute_lead_stats(user["id"])
+    await bump_versions(user["id"], "leads")
+    publish_change(user["id"], "leads", "invalidate")
+    scoring_wakeup.set()
+    return report
+
+@api_router.get("/leads/export")
+async def export_leads(
+    status: Optional[str] = None,
+    file_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    user: dict = Depends(get_current_user)
+):
+    query = {"user_id": user["id"]}
+    if status:
+        query["status"] = status
+    projection = {"_id": 0, **{field: 1 for field in LEAD_EXPORT_FIELDS}}
+    headers = {"Content-Disposition": f"attachment; filename=leads.{file_format}"}
+    if file_format == "ndjson":
+        response = stream_ndjson(db.leads, query, projection, "updated_at", None)
+        response.headers.update(headers)
+        return response
+
+    db_cursor = db.leads.find(query, projection).sort([("updated_at", -1), ("id", -1)]).batch_size(STREAM_BATCH_SIZE)
+
+    async def generate():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=LEAD_EXPORT_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        async for lead in db_cursor:
+            writer.writerow(lead)
+            if buffer.tell() >= 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    return StreamingResponse(generate(), media_type="text/csv", headers=headers)
 
 @api_router.get("/leads/{lead_id}", response_model=LeadResponse)
 async def get_lead(lead_id: str, user: dict = Depends(get_current_user)):
@@ -265,52 +1806,381 @@ async def get_lead(lead_id: str, user: dict = Depends(get_current_user)):
 async def update_lead(lead_id: str, data: LeadUpdate, user: dict = Depends(get_current_user)):
     update_data = {k: v for k, v in data.model_dump().items() if v is not None}
     update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    rescore = bool(SCORED_FIELDS & update_data.keys())
+    if "qualification_score" in update_data:
+        update_data.update(score_manual=True, ai_score_pending=False)
+    elif rescore:
+        update_data["ai_score_pending"] = True
     
-    result = await db.leads.update_one(
-        {"id": lead_id, "user_id": user["id"]},
-        {"$set": update_data}
-    )
-    if result.matched_count == 0:
+    try:
+        # The pre-image is needed to move the stats counters; the response is derived from it
+        before = await db.leads.find_one_and_update(
+            {"id": lead_id, "user_id": user["id"]},
+            {"$set": {**update_data, **company_fields(update_data)}},
+            {"_id": 0},
+            return_document=ReturnDocument.BEFORE
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="A lead for this company already exists")
+    if not before:
         raise HTTPException(status_code=404, detail="Lead not found")
-    
-    lead = await db.leads.find_one({"id": lead_id}, {"_id": 0})
+    lead = {**before, **update_data}
+    deltas = lead_stat_deltas(lead)
+    deltas.update(lead_stat_deltas(before, -1))
+    await apply_lead_stats(user["id"], deltas)
+    await bump_versions(user["id"], "leads")
+    publish_change(user["id"], "leads", "update", lead_id, fields=update_data)
+    if rescore:
+        scoring_wakeup.set()
     return LeadResponse(**lead)
 
+async def delete_leads_cascade(lead_ids: List[str], user_id: str) -> dict:
+    """Delete leads and their contacts atomically where transactions are available"""
+    deleted_leads = []
+
+    async def cascade(session):
+        owned = await db.leads.find(
+            {"id": {"$in": lead_ids}, "user_id": user_id},
+            {"_id": 0, "id": 1, **{dimension: 1 for dimension in STAT_DIMENSIONS}},
+            session=session
+        ).to_list(len(lead_ids))
+        deleted_leads[:] = owned
+        owned_ids = [lead["id"] for lead in owned]
+        if not owned_ids:
+            return {"deleted": 0, "contacts_deleted": 0}
+        leads_result = await db.leads.bulk_write(
+            [DeleteMany({"id": {"$in": chunk}, "user_id": user_id}) for chunk in chunked(owned_ids)],
+            ordered=False, session=session
+        )
+        contacts_result = await db.contacts.bulk_write(
+            [DeleteMany({"lead_id": {"$in": chunk}, "user_id": user_id}) for chunk in chunked(owned_ids)],
+            ordered=False, session=session
+        )
+        return {"deleted": leads_result.deleted_count, "contacts_deleted": contacts_result.deleted_count}
+
+    result = await run_in_transaction(cascade)
+    deltas = Counter()
+    for lead in deleted_leads:
+        deltas.update(lead_stat_deltas(lead, -1))
+    await apply_lead_stats(user_id, deltas)
+    if deleted_leads:
+        await bump_versions(user_id, "leads", "contacts")
+        for lead in deleted_leads:
+            publish_change(user_id, "leads", "delete", lead["id"])
+        publish_change(user_id, "contacts", "invalidate")
+    return result
+
 @api_router.delete("/leads/{lead_id}")
 async def delete_lead(lead_id: str, user: dict = Depends(get_current_user)):
-    result = await db.leads.delete_one({"id": lead_id, "user_id": user["id"]})
-    if result.deleted_count == 0:
+    result = await delete_leads_cascade([lead_id], user["id"])
+    if result["deleted"] == 0:
         raise HTTPException(status_code=404, detail="Lead not found")
-    await db.contacts.delete_many({"lead_id": lead_id})
     return {"message": "Lead deleted"}
 
+def email_domain(email: str) -> str:
+    return email.strip().rsplit("@", 1)[-1].lower()
+
+@api_router.post("/leads/bulk")
+async def bulk_lead_action(data: LeadBulkAction, user: dict = Depends(get_current_user)):
+    """Mass status change, cascading delete or re-assignment of leads"""
+    lead_ids = list(dict.fromkeys(data.lead_ids))
+    if not lead_ids:
+        raise HTTPException(status_code=400, detail="lead_ids must not be empty")
+    if len(lead_ids) > BULK_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_MAX_IDS} leads per request")
+    now = datetime.now(timezone.utc).isoformat()
+
+    if data.action == "status":
+        if not data.status:
+            raise HTTPException(status_code=400, detail="status is required")
+        previous = await db.leads.aggregate([
+            {"$match": {"id": {"$in": lead_ids}, "user_id": user["id"]}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}, "ids": {"$push": "$id"}}}
+        ]).to_list(None)
+        result = await db.leads.bulk_write(
+            [UpdateMany({"id": {"$in": chunk}, "user_id": user["id"]},
+                        {"$set": {"status": data.status, "updated_at": now}})
+             for chunk in chunked(lead_ids)],
+            ordered=False
+        )
+        deltas = Counter()
+        for group in previous:
+            if group["_id"] == data.status:
+                continue
+            deltas[f"status.{stat_key(group['_id'])}"] -= group["count"]
+            deltas[f"status.{stat_key(data.status)}"] += group["count"]
+        await apply_lead_stats(user["id"], deltas)
+        # Only the caller's own leads were updated; ids that matched nothing must not reach subscribers
+        owned = [lead_id for group in previous for lead_id in group["ids"]]
+        if owned:
+            await bump_versions(user["id"], "leads")
+        for lead_id in owned:
+            publish_change(user["id"], "leads", "update", lead_id, fields={"status": data.status, "updated_at": now})
+        return {"action": data.action, "matched": result.matched_count, "modified": result.modified_count}
+
+    if data.action == "delete":
+        result = await delete_leads_cascade(lead_ids, user["id"])
+        return {"action": data.action, **result}
+
+    if not data.assignee_email:
+        raise HTTPException(status_code=400, detail="assignee_email is required")
+    # Unknown emails and users outside the caller's team get the same answer
+    assignee = None
+    team = email_domain(user["email"])
+    if team in REASSIGN_TEAM_DOMAINS and email_domain(data.assignee_email) == team:
+        assignee = await db.users.find_one({"email": data.assignee_email}, {"_id": 0, "id": 1})
+    if not assignee:
+        raise HTTPException(status_code=403, detail="Assignee is not on your team")
+
+    moved_leads = []
+
+    async def reassign(session):
+        owned = await db.leads.find(
+            {"id": {"$in": lead_ids}, "user_id": user["id"]},
+            {"_id": 0, "id": 1, "company_name": 1, **{dimension: 1 for dimension in STAT_DIMENSIONS}},
+            session=session
+        ).to_list(len(lead_ids))
+        # The assignee may already hold a lead for the same company; those stay put
+        taken = await db.leads.distinct(
+            "company_name",
+            {"user_id": assignee["id"], "company_name": {"$in": [lead["company_name"] for lead in owned]}},
+            session=session
+        )
+        taken = set(taken)
+        moved_leads[:] = [lead for lead in owned if lead["company_name"] not in taken]
+        movable = [lead["id"] for lead in moved_leads]
+        conflicts = [lead["id"] for lead in owned if lead["company_name"] in taken]
+        if not movable:
+            return {"reassigned": 0, "contacts_reassigned": 0, "conflicts": conflicts}
+        leads_result = await db.leads.bulk_write(
+            [UpdateMany({"id": {"$in": chunk}, "user_id": user["id"]},
+                        {"$set": {"user_id": assignee["id"], "updated_at": now}})
+             for chunk in chunked(movable)],
+            ordered=False, session=session
+        )
+        contacts_result = await db.contacts.bulk_write(
+            [UpdateMany({"lead_id": {"$in": chunk}, "user_id": user["id"]},
+                        {"$set": {"user_id": assignee["id"]}})
+             for chunk in chunked(movable)],
+            ordered=False, session=session
+        )
+        return {
+            "reassigned": leads_result.modified_count,
+            "contacts_reassigned": contacts_result.modified_count,
+            "conflicts": conflicts
+        }
+
+    result = await run_in_transaction(reassign)
+    moved = Counter()
+    for lead in moved_leads:
+        moved.update(lead_stat_deltas(lead))
+    await apply_lead_stats(assignee["id"], moved)
+    await apply_lead_stats(user["id"], Counter({k: -v for k, v in moved.items()}))
+    if moved_leads:
+        await bump_versions(assignee["id"], "leads", "contacts")
+        await bump_versions(user["id"], "leads", "contacts")
+        for lead in moved_leads:
+            publish_change(user["id"], "leads", "delete", lead["id"])
+        publish_change(user["id"], "contacts", "invalidate")
+        publish_change(assignee["id"], "leads", "invalidate")
+        publish_change(assignee["id"], "contacts", "invalidate")
+    return {"action": data.action, **result}
+
+@api_router.post("/leads/duplicates", status_code=202)
+async def find_duplicate_leads(user: dict = Depends(get_current_user)):
+    """Queue a job clustering leads that share a normalized name or website domain, or have similar names"""
+    job = await enqueue_job("lead_duplicates", {}, user["id"])
+    return {"job_id": job["id"], "type": job["type"], "status": job["status"]}
+
 @api_router.get("/leads/stats/summary")
-async def get_lead_stats(user: dict = Depends(get_current_user)):
+async def get_lead_stats(request: Request, response: Response, user: dict = Depends(get_current_user)):
+    not_modified = await conditional_get(request, response, user["id"], "leads")
+    if not_modified:
+        return not_modified
+    stats = await db.lead_stats.find_one({"user_id": user["id"]}, {"_id": 0})
+    if not stats:
+        stats = await recompute_lead_stats(user["id"])
+    return lead_stats_summary(stats)
+
+def lead_stats_summary(stats: dict) -> dict:
+    by_status = stats.get("status", {})
+    return {
+        "total": stats.get("total", 0),
+        "new": by_status.get("new", 0),
+        "contacted": by_status.get("contacted", 0),
+        "qualified": by_status.get("qualified", 0),
+        "proposal": by_status.get("proposal", 0),
+        "won": by_status.get("won", 0),
+        "lost": by_status.get("lost", 0),
+        "by_industry": {k: v for k, v in stats.get("industry", {}).items() if v},
+        "by_company_size": {k: v for k, v in stats.get("company_size", {}).items() if v}
+    }
+
+# ============ CONTACT MATCHING ============
+
+# Normalized lookup fields stored on every contact; only these identify a person well enough to merge on.
+# A phone number is often a shared switchboard, so phone matches are only reported by the duplicates job.
+CONTACT_MATCH_KEYS = ("email_norm", "linkedin_handle")
+# Contact details a merge may fill in; name and title describe the person and are never taken from a match
+CONTACT_MERGE_FIELDS = ("email", "phone", "linkedin", "notes")
+LINKEDIN_PATTERN = re.compile(r"linkedin\.com/(?:in|pub)/([^/?#\s]+)", re.IGNORECASE)
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    if not email or "@" not in email:
+        return None
+    local, domain = email.strip().lower().rsplit("@", 1)
+    # Plus-addressing delivers to the same mailbox
+    local = local.split("+", 1)[0]
+    return f"{local}@{domain}" if local and domain else None
+
+def normalize_linkedin(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    match = LINKEDIN_PATTERN.search(value)
+    if match:
+        return match.group(1).lower()
+    value = value.strip().lstrip("@").lower()
+    # A bare handle; anything else URL-like is not a profile we can match on
+    return value if value and "/" not in value and " " not in value else None
+
+def normalize_phone(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    digits = re.sub(r"\D", "", value)
+    if len(digits) < 7:
+        return None
+    # Compare national numbers so "+1 555 010 0199" matches "(555) 010-0199"
+    return digits[-10:]
+
+def contact_keys(fields: dict) -> dict:
+    """Normalized match fields for whichever of email, linkedin and phone are present in fields"""
+    keys = {}
+    if "email" in fields:
+        keys["email_norm"] = normalize_email(fields["email"])
+        keys["email_domain"] = keys["email_norm"].split("@", 1)[1] if keys["email_norm"] else None
+    if "linkedin" in fields:
+        keys["linkedin_handle"] = normalize_linkedin(fields["linkedin"])
+    if "phone" in fields:
+        keys["phone_norm"] = normalize_phone(fields["phone"])
+    return keys
+
+def duplicate_query(user_id: str, keys: dict) -> Optional[dict]:
+    clauses = [{key: keys[key]} for key in CONTACT_MATCH_KEYS if keys.get(key)]
+    return {"user_id": user_id, "$or": clauses} if clauses else None
+
+def merge_contact_fields(existing: dict, incoming: dict) -> dict:
+    """Fields to fill on an existing contact; values already set are never overwritten"""
+    fill = {k: incoming[k] for k in CONTACT_MERGE_FIELDS if incoming.get(k) and not existing.get(k)}
+    return {**fill, **contact_keys(fill)}
+
+def duplicate_detail(existing: dict) -> str:
+    return f"Contact already exists on lead {existing['lead_id']} (contact {existing['id']})"
+
+async def backfill_contact_keys(user_id: str) -> int:
+    """Add match fields to contacts created before they existed"""
+    updated = 0
+    while True:
+        contacts = await db.contacts.find(
+            {"user_id": user_id, "email_norm": {"$exists": False}},
+            {"_id": 0, "id": 1, "email": 1, "linkedin": 1, "phone": 1}
+        ).to_list(CONTACT_DEDUP_BACKFILL_BATCH)
+        if not contacts:
+            return updated
+        await db.contacts.bulk_write([
+            UpdateOne({"id": c["id"]}, {"$set": contact_keys({"email": None, "linkedin": None, "phone": None, **c})})
+            for c in contacts
+        ], ordered=False)
+        updated += len(contacts)
+
+# Each block groups contacts sharing one exact key, so only contacts within a block are ever compared
+DEDUP_BLOCKS = {
+    "email": "$email_norm",
+    "linkedin": "$linkedin_handle",
+    "phone": "$phone_norm",
+    "lead_and_name": {"lead": "$lead_id", "name": {"$toLower": {"$trim": {"input": "$name"}}}},
+}
+
+async def duplicate_groups(collection, user_id: str, key):
     pipeline = [
-        {"$match": {"user_id": user["id"]}},
-        {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        {"$match": {"user_id": user_id}},
+        {"$group": {"_id": key, "ids": {"$push": "$id"}, "count": {"$sum": 1}}},
+        {"$match": {"_id": {"$nin": [None, ""]}, "count": {"$gt": 1}}},
+    ]
+    async for group in collection.aggregate(pipeline, allowDiskUse=True):
+        yield group["ids"]
+
+def cluster_duplicates(edges: List[tuple], id_field: str = "contact_ids") -> List[dict]:
+    """Union-find over (block, ids) groups into clusters of records that are the same person or company"""
+    parent = {}
+    matched_on = {}
+
+    def find(x):
+        while parent.setdefault(x, x) != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for block, ids in edges:
+        root = find(ids[0])
+        for other in ids[1:]:
+            other_root = find(other)
+            if other_root != root:
+                parent[other_root] = root
+                matched_on.setdefault(root, set()).update(matched_on.pop(other_root, ()))
+        matched_on.setdefault(root, set()).add(block)
+
+    clusters = {}
+    for record_id in parent:
+        clusters.setdefault(find(record_id), []).append(record_id)
+    return [
+        {id_field: sorted(ids), "size": len(ids), "matched_on": sorted(matched_on.get(root, ()))}
+        for root, ids in clusters.items()
     ]
-    results = await db.leads.aggregate(pipeline).to_list(100)
-    stats = {r["_id"]: r["count"] for r in results}
-    total = sum(stats.values())
+
+async def find_contact_duplicate_clusters(user_id: str) -> dict:
+    """Cluster the user's contacts sharing an email, LinkedIn handle, phone or lead and name"""
+    backfilled = await backfill_contact_keys(user_id)
+    edges = []
+    for block, key in DEDUP_BLOCKS.items():
+        async for ids in duplicate_groups(db.contacts, user_id, key):
+            edges.append((block, ids))
+    clusters = sorted(cluster_duplicates(edges), key=lambda c: -c["size"])
     return {
-        "total": total,
-        "new": stats.get("new", 0),
-        "contacted": stats.get("contacted", 0),
-        "qualified": stats.get("qualified", 0),
-        "proposal": stats.get("proposal", 0),
-        "won": stats.get("won", 0),
-        "lost": stats.get("lost", 0)
+        "backfilled": backfilled,
+        "total": len(clusters),
+        "duplicate_contacts": sum(c["size"] for c in clusters),
+        "clusters": clusters[:CONTACT_DEDUP_MAX_CLUSTERS],
+        "clusters_truncated": len(clusters) > CONTACT_DEDUP_MAX_CLUSTERS
     }
 
 # ============ CONTACTS ROUTES ============
 
 @api_router.post("/contacts", response_model=ContactResponse)
-async def create_contact(data: ContactCreate, user: dict = Depends(get_current_user)):
+async def create_contact(
+    data: ContactCreate,
+    on_duplicate: Literal["merge", "reject", "allow"] = "merge",
+    user: dict = Depends(get_current_user)
+):
+    """Create a contact; a match on email or LinkedIn on the same lead is merged instead"""
     lead = await db.leads.find_one({"id": data.lead_id, "user_id": user["id"]})
     if not lead:
         raise HTTPException(status_code=404, detail="Lead not found")
     
+    keys = contact_keys(data.model_dump())
+    dup_query = duplicate_query(user["id"], keys) if on_duplicate != "allow" else None
+    existing = await db.contacts.find_one(dup_query, {"_id": 0}) if dup_query else None
+    if existing:
+        if on_duplicate == "reject" or existing["lead_id"] != data.lead_id:
+            raise HTTPException(status_code=409, detail=duplicate_detail(existing))
+        fill = merge_contact_fields(existing, data.model_dump())
+        if fill:
+            existing = await db.contacts.find_one_and_update(
+                {"id": existing["id"]}, {"$set": fill}, {"_id": 0}, return_document=ReturnDocument.AFTER
+            )
+            await bump_versions(user["id"], "contacts")
+            publish_change(user["id"], "contacts", "update", existing["id"], fields=fill)
+        return ContactResponse(**existing)
+
     contact_id = str(uuid.uuid4())
     contact_doc = {
         "id": contact_id,
@@ -321,33 +2191,196 @@ async def create_contact(data: ContactCreate, user: dict = Depends(get_current_u
         "phone": data.phone,
         "linkedin": data.linkedin,
         "notes": data.notes,
+        **keys,
         "created_at": datetime.now(timezone.utc).isoformat(),
         "user_id": user["id"]
     }
     await db.contacts.insert_one(contact_doc)
+    await bump_versions(user["id"], "contacts")
+    publish_change(user["id"], "contacts", "insert", contact_id, doc=contact_doc)
     contact_doc.pop("_id", None)
     contact_doc.pop("user_id", None)
     return ContactResponse(**contact_doc)
 
+@api_router.post("/contacts/import")
+async def import_contacts(
+    request: Request,
+    file_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    batch_size: int = Query(IMPORT_BATCH_SIZE, ge=1, le=10000),
+    on_duplicate: Literal["merge", "reject", "allow"] = "merge",
+    user: dict = Depends(get_current_user)
+):
+    """Bulk insert contacts from a CSV or NDJSON body, merging duplicates and reporting per-row errors"""
+    report = {"processed": 0, "created": 0, "merged": 0, "failed": 0, "errors": [], "errors_truncated": False}
+    batch = []
+
+    def record_error(row_number: int, message: str):
+        report["failed"] += 1
+        if len(report["errors"]) < IMPORT_MAX_ERRORS:
+            report["errors"].append({"row": row_number, "error": message})
+        else:
+            report["errors_truncated"] = True
+
+    async def flush():
+        if not batch:
+            return
+        lead_ids = list({contact.lead_id for _, contact in batch})
+        leads = await db.leads.find({"id": {"$in": lead_ids}, "user_id": user["id"]}, {"_id": 0, "id": 1}).to_list(len(lead_ids))
+        known_leads = {lead["id"] for lead in leads}
+
+        # One query per batch finds every stored contact sharing a match key with any row
+        rows = [(row_number, contact.model_dump()) for row_number, contact in batch]
+        index = {}
+        if on_duplicate != "allow":
+            values = {key: set() for key in CONTACT_MATCH_KEYS}
+            for _, row in rows:
+                for key, value in contact_keys(row).items():
+                    if key in values and value:
+                        values[key].add(value)
+            clauses = [{key: {"$in": list(v)}} for key, v in values.items() if v]
+            if clauses:
+                async for existing in db.contacts.find({"user_id": user["id"], "$or": clauses}, {"_id": 0, "user_id": 0}):
+                    for key in CONTACT_MATCH_KEYS:
+                        if existing.get(key):
+                            index.setdefault((key, existing[key]), existing)
+
+        ops = []
+        op_rows = []
+        pending = set()
+        now = datetime.now(timezone.utc).isoformat()
+        for row_number, row in rows:
+            if row["lead_id"] not in known_leads:
+                record_error(row_number, "Lead not found")
+                continue
+            keys = contact_keys(row)
+            existing = next((index[(k, keys[k])] for k in CONTACT_MATCH_KEYS if (k, keys.get(k)) in index), None)
+            if existing:
+                if on_duplicate == "reject" or existing["lead_id"] != row["lead_id"]:
+                    record_error(row_number, duplicate_detail(existing))
+                    continue
+                fill = merge_contact_fields(existing, row)
+                # Rows created earlier in this batch are merged into their pending insert
+                existing.update(fill)
+                if fill and existing["id"] not in pending:
+                    ops.append(UpdateOne({"id": existing["id"]}, {"$set": fill}))
+                    op_rows.append((row_number, "merged"))
+                else:
+                    report["merged"] += 1
+                continue
+            doc = {**row, **keys, "id": str(uuid.uuid4()), "created_at": now, "user_id": user["id"]}
+            ops.append(InsertOne(doc))
+            op_rows.append((row_number, "created"))
+            pending.add(doc["id"])
+            if on_duplicate != "allow":
+                # Later rows in the same upload merge into this one
+                for key in CONTACT_MATCH_KEYS:
+                    if keys.get(key):
+                        index.setdefault((key, keys[key]), doc)
+        batch.clear()
+        if not ops:
+            return
+        try:
+            await db.contacts.bulk_write(ops, ordered=False)
+            write_errors = []
+        except BulkWriteError as e:
+            write_errors = e.details.get("writeErrors", [])
+        failed_ops = {err["index"]: err.get("errmsg", "Write failed") for err in write_errors}
+        for i, (row_number, outcome) in enumerate(op_rows):
+            if i in failed_ops:
+                record_error(row_number, failed_ops[i])
+            else:
+                report[outcome] += 1
+
+    spool = await spool_request_body(request)
+    try:
+        for row_number, row, error in iter_import_rows(spool, file_format):
+            report["processed"] += 1
+            if error:
+                record_error(row_number, error)
+                continue
+            try:
+                batch.append((row_number, ContactCreate(**row)))
+            except ValidationError as e:
+                record_error(row_number, format_error(e))
+                continue
+            if len(batch) >= batch_size:
+                await flush()
+        await flush()
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Upload must be UTF-8 encoded")
+    except csv.Error as e:
+        raise HTTPException(status_code=400, detail=f"Malformed CSV: {str(e)}")
+    finally:
+        spool.close()
+    if report["created"] or report["merged"]:
+        await bump_versions(user["id"], "contacts")
+        publish_change(user["id"], "contacts", "invalidate")
+    return report
+
+@api_router.post("/contacts/duplicates", status_code=202)
+async def find_duplicate_contacts(user: dict = Depends(get_current_user)):
+    """Queue a job clustering contacts that share an email, LinkedIn handle, phone or lead and name"""
+    job = await enqueue_job("contact_duplicates", {}, user["id"])
+    return {"job_id": job["id"], "type": job["type"], "status": job["status"]}
+
 @api_router.get("/contacts", response_model=List[ContactResponse])
-async def get_contacts(lead_id: Optional[str] = None, user: dict = Depends(get_current_user)):
+async def get_contacts(
+    request: Request,
+    response: Response,
+    lead_id: Optional[str] = None,
+    email: Optional[str] = None,
+    domain: Optional[str] = None,
+    linkedin: Optional[str] = None,
+    phone: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(LIST_PAGE_SIZE, ge=1, le=LIST_PAGE_SIZE_MAX),
+    stream: bool = False,
+    fields: Optional[str] = None,
+    user: dict = Depends(get_current_user)
+):
     query = {"user_id": user["id"]}
     if lead_id:
         query["lead_id"] = lead_id
-    contacts = await db.contacts.find(query, {"_id": 0, "user_id": 0}).to_list(1000)
-    return [ContactResponse(**c) for c in contacts]
+    # Lookups match on the normalized forms, so any spelling of the same address or number works
+    filters = {
+        "email_norm": ("email", email, normalize_email),
+        "email_domain": ("domain", domain, lambda value: value.strip().lower().lstrip("@") or None),
+        "linkedin_handle": ("linkedin", linkedin, normalize_linkedin),
+        "phone_norm": ("phone", phone, normalize_phone),
+    }
+    for field, (param, value, normalize) in filters.items():
+        if not value:
+            continue
+        normalized = normalize(value)
+        # Querying on None would match every contact that lacks the field
+        if not normalized:
+            raise HTTPException(status_code=400, detail=f"Invalid {param} filter: {value}")
+        query[field] = normalized
+    projection = list_projection(ContactResponse, fields, "id", "created_at")
+    if stream:
+        return stream_ndjson(db.contacts, query, projection, "created_at", cursor)
+    not_modified = await conditional_get(request, response, user["id"], "contacts")
+    if not_modified:
+        return not_modified
+    contacts = await fetch_page(db.contacts, query, projection, "created_at", cursor, limit, response)
+    return lean_response(contacts, response)
 
 @api_router.put("/contacts/{contact_id}", response_model=ContactResponse)
 async def update_contact(contact_id: str, data: ContactUpdate, user: dict = Depends(get_current_user)):
     update_data = {k: v for k, v in data.model_dump().items() if v is not None}
-    result = await db.contacts.update_one(
-        {"id": contact_id, "user_id": user["id"]},
-        {"$set": update_data}
-    )
-    if result.matched_count == 0:
+    query = {"id": contact_id, "user_id": user["id"]}
+    projection = {"_id": 0, "user_id": 0}
+    if update_data:
+        contact = await db.contacts.find_one_and_update(
+            query, {"$set": {**update_data, **contact_keys(update_data)}}, projection, return_document=ReturnDocument.AFTER
+        )
+    else:
+        contact = await db.contacts.find_one(query, projection)
+    if not contact:
         raise HTTPException(status_code=404, detail="Contact not found")
-    
-    contact = await db.contacts.find_one({"id": contact_id}, {"_id": 0, "user_id": 0})
+    if update_data:
+        await bump_versions(user["id"], "contacts")
+        publish_change(user["id"], "contacts", "update", contact_id, fields=update_data)
     return ContactResponse(**contact)
 
 @api_router.delete("/contacts/{contact_id}")
@@ -355,8 +2388,131 @@ async def delete_contact(contact_id: str, user: dict = Depends(get_current_user)
     result = await db.contacts.delete_one({"id": contact_id, "user_id": user["id"]})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Contact not found")
+    await bump_versions(user["id"], "contacts")
+    publish_change(user["id"], "contacts", "delete", contact_id)
     return {"message": "Contact deleted"}
 
+# ============ TEMPLATE ENGINE ============
+
+# {{name}} or {{name|fallback}}; anything else is literal text
+PLACEHOLDER_PATTERN = re.compile(r"\{\{\s*([A-Za-z_]\w*)\s*(?:\|([^{}]*))?\}\}")
+
+def compile_template(text: str) -> tuple:
+    """Split template text into literal strings and (variable, fallback) placeholders"""
+    parts = []
+    position = 0
+    for match in PLACEHOLDER_PATTERN.finditer(text):
+        if match.start() > position:
+            parts.append(text[position:match.start()])
+        fallback = match.group(2)
+        parts.append((match.group(1), fallback.strip() if fallback is not None else None))
+        position = match.end()
+    if position < len(text):
+        parts.append(text[position:])
+    return tuple(parts)
+
+def compiled_template(template: dict) -> tuple:
+    """Return (compiled subject, compiled body), reusing the cached parse while the text is unchanged"""
+    cached = template_cache.get(template["id"])
+    if cached is not None and cached[0] == template["subject"] and cached[1] == template["body"]:
+        template_cache_stats.hits += 1
+        return cached[2], cached[3]
+    template_cache_stats.misses += 1
+    subject, body = compile_template(template["subject"]), compile_template(template["body"])
+    template_cache[template["id"]] = (template["subject"], template["body"], subject, body)
+    return subject, body
+
+def template_variables(compiled: tuple) -> set:
+    return {part[0] for part in compiled if isinstance(part, tuple)}
+
+def render_compiled(compiled: tuple, variables: dict, missing: set) -> str:
+    out = []
+    for part in compiled:
+        if isinstance(part, str):
+            out.append(part)
+            continue
+        name, fallback = part
+        value = variables.get(name)
+        if value is None:
+            if fallback is None:
+                missing.add(name)
+            value = fallback or ""
+        out.append(str(value))
+    return "".join(out)
+
+def merge_variables(lead: dict, contact: Optional[dict], sender: dict, extra: dict) -> dict:
+    """Placeholder values for one recipient; request-level variables override the record fields"""
+    variables = {
+        "company": lead.get("company_name"),
+        "company_name": lead.get("company_name"),
+        "industry": lead.get("industry"),
+        "company_size": lead.get("company_size"),
+        "website": lead.get("website"),
+        "sender_name": sender.get("name"),
+        "sender_email": sender.get("email"),
+    }
+    if contact:
+        name = contact.get("name") or ""
+        variables.update({
+            "name": name,
+            "first_name": name.split(" ")[0],
+            "title": contact.get("title"),
+            "email": contact.get("email"),
+        })
+    variables.update(extra)
+    return {k: v for k, v in variables.items() if v not in (None, "")}
+
+async def personalize_leads(leads: List[dict], user_id: str) -> dict:
+    """Return lead id -> one-line LLM personalization; leads whose call fails are left out"""
+    async def personalize(lead):
+        response, _ = await complete_cached(
+            "personalization", f"personalize_{user_id}", PERSONALIZATION_SYSTEM_MESSAGE,
+            build_personalization_prompt(lead)
+        )
+        return response.strip()
+
+    results = await asyncio.gather(*(personalize(lead) for lead in leads), return_exceptions=True)
+    lines = {}
+    for lead, result in zip(leads, results):
+        if isinstance(result, Exception):
+            logger.error(f"Personalization error for lead {lead['id']}: {str(result)}")
+        else:
+            lines[lead["id"]] = result
+    return lines
+
+async def render_for_recipients(template: dict, recipients: List[tuple], user: dict,
+                                extra: dict, personalize: bool) -> List[dict]:
+    """Render a template for (lead, contact) pairs; contact may be None"""
+    subject, body = compiled_template(template)
+    personalization = {}
+    if personalize and "personalization" in template_variables(subject) | template_variables(body):
+        if not llm_client.configured:
+            raise HTTPException(status_code=500, detail="LLM API key not configured")
+        unique_leads = list({lead["id"]: lead for lead, _ in recipients}.values())
+        personalization = await personalize_leads(unique_leads, user["id"])
+
+    rendered = []
+    for lead, contact in recipients:
+        variables = merge_variables(lead, contact, user, extra)
+        if lead["id"] in personalization:
+            variables.setdefault("personalization", personalization[lead["id"]])
+        missing = set()
+        rendered.append({
+            "lead_id": lead["id"],
+            "contact_id": contact["id"] if contact else None,
+            "to": contact.get("email") if contact else None,
+            "subject": render_compiled(subject, variables, missing),
+            "body": render_compiled(body, variables, missing),
+            "missing": sorted(missing)
+        })
+    return rendered
+
+async def load_template(template_id: str, user_id: str) -> dict:
+    template = await db.templates.find_one({"id": template_id, "user_id": user_id}, {"_id": 0})
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
+    return template
+
 # ============ TEMPLATES ROUTES ============
 
 @api_router.post("/templates", response_model=TemplateResponse)
@@ -372,25 +2528,35 @@ async def create_template(data: TemplateCreate, user: dict = Depends(get_current
         "user_id": user["id"]
     }
     await db.templates.insert_one(template_doc)
+    await bump_versions(user["id"], "templates")
+    publish_change(user["id"], "templates", "insert", template_id, doc=template_doc)
     template_doc.pop("_id", None)
     return TemplateResponse(**template_doc)
 
 @api_router.get("/templates", response_model=List[TemplateResponse])
-async def get_templates(user: dict = Depends(get_current_user)):
-    templates = await db.templates.find({"user_id": user["id"]}, {"_id": 0}).to_list(100)
-    return [TemplateResponse(**t) for t in templates]
+async def get_templates(request: Request, response: Response, user: dict = Depends(get_current_user)):
+    not_modified = await conditional_get(request, response, user["id"], "templates")
+    if not_modified:
+        return not_modified
+    templates = await db.templates.find({"user_id": user["id"]}, list_projection(TemplateResponse, None)).to_list(100)
+    return lean_response(templates, response)
 
 @api_router.put("/templates/{template_id}", response_model=TemplateResponse)
 async def update_template(template_id: str, data: TemplateUpdate, user: dict = Depends(get_current_user)):
     update_data = {k: v for k, v in data.model_dump().items() if v is not None}
-    result = await db.templates.update_one(
-        {"id": template_id, "user_id": user["id"]},
-        {"$set": update_data}
-    )
-    if result.matched_count == 0:
+    query = {"id": template_id, "user_id": user["id"]}
+    if update_data:
+        template = await db.templates.find_one_and_update(
+            query, {"$set": update_data}, {"_id": 0}, return_document=ReturnDocument.AFTER
+        )
+    else:
+        template = await db.templates.find_one(query, {"_id": 0})
+    if not template:
         raise HTTPException(status_code=404, detail="Template not found")
-    
-    template = await db.templates.find_one({"id": template_id}, {"_id": 0})
+    template_cache.pop(template_id, None)
+    if update_data:
+        await bump_versions(user["id"], "templates")
+        publish_change(user["id"], "templates", "update", template_id, fields=update_data)
     return TemplateResponse(**template)
 
 @api_router.delete("/templates/{template_id}")
@@ -398,30 +2564,87 @@ async def delete_template(template_id: str, user: dict = Depends(get_current_use
     result = await db.templates.delete_one({"id": template_id, "user_id": user["id"]})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Template not found")
+    template_cache.pop(template_id, None)
+    await bump_versions(user["id"], "templates")
+    publish_change(user["id"], "templates", "delete", template_id)
     return {"message": "Template deleted"}
 
-# ============ AI ROUTES ============
+@api_router.post("/templates/{template_id}/render")
+async def render_template(template_id: str, data: TemplateRenderRequest, user: dict = Depends(get_current_user)):
+    """Render a template for one lead, and optionally one of its contacts"""
+    template = await load_template(template_id, user["id"])
+    lead = await db.leads.find_one({"id": data.lead_id, "user_id": user["id"]}, {"_id": 0})
+    if not lead:
+        raise HTTPException(status_code=404, detail="Lead not found")
+    contact = None
+    if data.contact_id:
+        contact = await db.contacts.find_one(
+            {"id": data.contact_id, "lead_id": data.lead_id, "user_id": user["id"]}, {"_id": 0}
+        )
+        if not contact:
+            raise HTTPException(status_code=404, detail="Contact not found")
+    rendered = await render_for_recipients(template, [(lead, contact)], user, data.variables, data.personalize)
+    return rendered[0]
+
+@api_router.post("/templates/{template_id}/merge")
+async def mail_merge(template_id: str, data: MailMergeRequest, user: dict = Depends(get_current_user)):
+    """Render a template for many contacts (with their leads) and leads in one request"""
+    contact_ids = list(dict.fromkeys(data.contact_ids))
+    lead_ids = list(dict.fromkeys(data.lead_ids))
+    if not contact_ids and not lead_ids:
+        raise HTTPException(status_code=400, detail="Provide lead_ids or contact_ids")
+    if len(contact_ids) + len(lead_ids) > MAIL_MERGE_MAX_RECIPIENTS:
+        raise HTTPException(status_code=400, detail=f"At most {MAIL_MERGE_MAX_RECIPIENTS} recipients per merge")
+    template = await load_template(template_id, user["id"])
+
+    contacts = await db.contacts.find(
+        {"id": {"$in": contact_ids}, "user_id": user["id"]}, {"_id": 0}
+    ).to_list(len(contact_ids)) if contact_ids else []
+    wanted_leads = set(lead_ids) | {contact["lead_id"] for contact in contacts}
+    leads = await db.leads.find(
+        {"id": {"$in": list(wanted_leads)}, "user_id": user["id"]}, {"_id": 0}
+    ).to_list(len(wanted_leads))
+    leads_by_id = {lead["id"]: lead for lead in leads}
+    contacts_by_id = {contact["id"]: contact for contact in contacts if contact["lead_id"] in leads_by_id}
+
+    recipients = [(leads_by_id[contacts_by_id[cid]["lead_id"]], contacts_by_id[cid]) for cid in contact_ids
+                  if cid in contacts_by_id]
+    recipients += [(leads_by_id[lid], None) for lid in lead_ids if lid in leads_by_id]
+    rendered = await render_for_recipients(template, recipients, user, data.variables, data.personalize)
+    return {
+        "template_id": template_id,
+        "rendered": rendered,
+        "not_found": {
+            "contact_ids": [cid for cid in contact_ids if cid not in contacts_by_id],
+            "lead_ids": [lid for lid in lead_ids if lid not in leads_by_id]
+        }
+    }
 
-@api_router.post("/ai/research")
-async def ai_research_company(data: AIResearchRequest, user: dict = Depends(get_current_user)):
-    if not EMERGENT_LLM_KEY:
-        raise HTTPException(status_code=500, detail="LLM API key not configured")
-    
-    try:
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"research_{user['id']}_{uuid.uuid4()}",
-            system_message="""You are an expert B2B sales researcher specializing in HR services. 
+# ============ AI HELPERS ============
+
+RESEARCH_SYSTEM_MESSAGE = """You are an expert B2B sales researcher specializing in HR services. 
             Analyze companies and provide actionable insights for HR service providers.
             Focus on: company size indicators, HR pain points, growth signals, and potential HR service needs.
             Be concise and practical."""
-        ).with_model("openai", "gpt-5.2")
-        
-        prompt = f"""Research this company for HR service opportunities:
 
-Company: {data.company_name}
-Industry: {data.industry or 'Unknown'}
-Additional Context: {data.additional_context or 'None'}
+CONTACTS_SYSTEM_MESSAGE = """You are an expert at identifying key decision-makers for HR services.
+            Suggest likely contact roles and how to find them.
+            Focus on HR Directors, People Operations, CHROs, and CEOs for smaller companies."""
+
+EMAIL_SYSTEM_MESSAGE = """You are an expert B2B sales copywriter for HR services.
+            Write personalized, professional outreach emails that are concise and compelling.
+            Focus on value proposition and specific pain points."""
+
+PERSONALIZATION_SYSTEM_MESSAGE = """You are an expert B2B sales copywriter for HR services.
+            Write a single personalized opening sentence for an outreach email.
+            Reply with the sentence only."""
+
+def build_research_prompt(company_name: str, industry: Optional[str], additional_context: Optional[str]) -> str:
+    return f"""Research this company for HR service opportunities:
+
+Company: {company_name}
+Industry: {industry or 'Unknown'}
+Additional Context: {additional_context or 'None'}
 
 Provide:
 1. Company Overview (2-3 sentences)
@@ -431,27 +2654,8 @@ Provide:
 5. Best Approach for Outreach (2-3 sentences)
 6. Recommended Services: Which HR services would benefit them most?"""
 
-        response = await chat.send_message(UserMessage(text=prompt))
-        return {"research": response, "company_name": data.company_name}
-    except Exception as e:
-        logger.error(f"AI Research error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"AI research failed: {str(e)}")
-
-@api_router.post("/ai/discover-contacts")
-async def ai_discover_contacts(data: AIContactDiscoveryRequest, user: dict = Depends(get_current_user)):
-    if not EMERGENT_LLM_KEY:
-        raise HTTPException(status_code=500, detail="LLM API key not configured")
-    
-    try:
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"contacts_{user['id']}_{uuid.uuid4()}",
-            system_message="""You are an expert at identifying key decision-makers for HR services.
-            Suggest likely contact roles and how to find them.
-            Focus on HR Directors, People Operations, CHROs, and CEOs for smaller companies."""
-        ).with_model("openai", "gpt-5.2")
-        
-        prompt = f"""For the company "{data.company_name}", suggest the best contacts to reach for HR services:
+def build_contacts_prompt(company_name: str) -> str:
+    return f"""For the company "{company_name}", suggest the best contacts to reach for HR services:
 
 1. List 3-5 key decision-maker roles to target
 2. For each role, provide:
@@ -461,37 +2665,11 @@ async def ai_discover_contacts(data: AIContactDiscoveryRequest, user: dict = Dep
 3. Suggested outreach priority order
 4. Best initial contact approach for each role"""
 
-        response = await chat.send_message(UserMessage(text=prompt))
-        return {"contacts_research": response, "company_name": data.company_name}
-    except Exception as e:
-        logger.error(f"AI Contact Discovery error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"AI contact discovery failed: {str(e)}")
-
-@api_router.post("/ai/generate-email")
-async def ai_generate_email(lead_id: str, template_id: Optional[str] = None, user: dict = Depends(get_current_user)):
-    if not EMERGENT_LLM_KEY:
-        raise HTTPException(status_code=500, detail="LLM API key not configured")
-    
-    lead = await db.leads.find_one({"id": lead_id, "user_id": user["id"]}, {"_id": 0})
-    if not lead:
-        raise HTTPException(status_code=404, detail="Lead not found")
-    
+def build_email_prompt(lead: dict, template: Optional[dict]) -> str:
     template_context = ""
-    if template_id:
-        template = await db.templates.find_one({"id": template_id, "user_id": user["id"]}, {"_id": 0})
-        if template:
-            template_context = f"\nUse this template style:\nSubject: {template['subject']}\nBody: {template['body']}"
-    
-    try:
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"email_{user['id']}_{uuid.uuid4()}",
-            system_message="""You are an expert B2B sales copywriter for HR services.
-            Write personalized, professional outreach emails that are concise and compelling.
-            Focus on value proposition and specific pain points."""
-        ).with_model("openai", "gpt-5.2")
-        
-        prompt = f"""Generate a personalized outreach email for:
+    if template:
+        template_context = f"\nUse this template style:\nSubject: {template['subject']}\nBody: {template['body']}"
+    return f"""Generate a personalized outreach email for:
 
 Company: {lead['company_name']}
 Industry: {lead.get('industry', 'Unknown')}
@@ -504,12 +2682,1014 @@ Create:
 2. Email body (under 150 words)
 3. Clear call-to-action"""
 
-        response = await chat.send_message(UserMessage(text=prompt))
-        return {"email": response, "lead_id": lead_id}
+def build_personalization_prompt(lead: dict) -> str:
+    return f"""Write one opening sentence for an outreach email to:
+
+Company: {lead['company_name']}
+Industry: {lead.get('industry') or 'Unknown'}
+Company Size: {lead.get('company_size') or 'Unknown'}
+Notes: {lead.get('notes') or 'None'}
+AI Insights: {lead.get('ai_insights') or 'None available'}
+
+Reference something specific to the company and its likely HR challenges. Under 30 words."""
+
+# ============ LLM CLIENT ============
+
+class EmergentBackend:
+    """Calls the real provider through emergentintegrations"""
+    name = "emergent"
+
+    @property
+    def configured(self) -> bool:
+        return bool(EMERGENT_LLM_KEY)
+
+    def _chat(self, provider: str, model: str, session_prefix: str, system_message: str) -> LlmChat:
+        # LlmChat keeps per-session message history, so each call gets its own session
+        return LlmChat(
+            api_key=EMERGENT_LLM_KEY,
+            session_id=f"{session_prefix}_{uuid.uuid4()}",
+            system_message=system_message
+        ).with_model(provider, model)
+
+    async def complete(self, provider: str, model: str, session_prefix: str, system_message: str, prompt: str) -> str:
+        chat = self._chat(provider, model, session_prefix, system_message)
+        return await chat.send_message(UserMessage(text=prompt))
+
+    async def stream(self, provider: str, model: str, session_prefix: str, system_message: str, prompt: str):
+        chat = self._chat(provider, model, session_prefix, system_message)
+        stream_message = getattr(chat, "stream_message", None)
+        if stream_message is None:
+            # Client without token streaming: the whole answer arrives as one chunk
+            yield await chat.send_message(UserMessage(text=prompt))
+            return
+        async for chunk in stream_message(UserMessage(text=prompt)):
+            yield chunk
+
+class StubBackend:
+    """Deterministic local provider for tests and benchmarks"""
+    name = "stub"
+    configured = True
+
+    def __init__(self, latency_ms: int):
+        self.latency = latency_ms / 1000
+
+    def _answer(self, model: str, prompt: str) -> str:
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        return f"[stub {model} {digest[:12]}] {prompt.splitlines()[0] if prompt else ''}"
+
+    async def complete(self, provider: str, model: str, session_prefix: str, system_message: str, prompt: str) -> str:
+        await asyncio.sleep(self.latency)
+        return self._answer(model, prompt)
+
+    async def stream(self, provider: str, model: str, session_prefix: str, system_message: str, prompt: str):
+        words = self._answer(model, prompt).split(" ")
+        for i, word in enumerate(words):
+            await asyncio.sleep(self.latency / len(words))
+            yield word if i == len(words) - 1 else word + " "
+
+def is_rate_limited(e: Exception) -> bool:
+    if getattr(e, "status_code", None) == 429:
+        return True
+    message = str(e).lower()
+    return "rate limit" in message or "ratelimit" in message or "429" in message
+
+class LLMClient:
+    """Shared LLM entry point: per-provider concurrency limits, request coalescing and rate-limit backoff"""
+
+    def __init__(self, backend, max_concurrency: int, retries: int, backoff: float):
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.semaphores = {}
+        self.inflight = {}
+        self.stats = {"calls": 0, "coalesced": 0, "rate_limited": 0, "errors": 0}
+
+    @property
+    def configured(self) -> bool:
+        return self.backend.configured
+
+    def _semaphore(self, provider: str) -> asyncio.Semaphore:
+        if provider not in self.semaphores:
+            self.semaphores[provider] = asyncio.Semaphore(self.max_concurrency)
+        return self.semaphores[provider]
+
+    async def _backoff(self, attempt: int):
+        self.stats["rate_limited"] += 1
+        await asyncio.sleep(self.backoff * 2 ** attempt + random.uniform(0, self.backoff))
+
+    def _span(self, provider: str, model: str, mode: str, started: float, outcome: str, prompt: str, response: str = ""):
+        # emergentintegrations returns plain text, so token counts are estimated from it
+        llm_request_seconds.observe(time.perf_counter() - started, provider, model, mode, outcome)
+        llm_tokens.inc(provider, model, "prompt", amount=estimate_tokens(prompt))
+        if response:
+            llm_tokens.inc(provider, model, "completion", amount=estimate_tokens(response))
+
+    async def _call(self, provider: str, model: str, session_prefix: str, system_message: str, prompt: str) -> str:
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._semaphore(provider):
+                    self.stats["calls"] += 1
+                    started = time.perf_counter()
+                    try:
+                        response = await self.backend.complete(provider, model, session_prefix, system_message, prompt)
+                    except Exception as e:
+                        outcome = "rate_limited" if is_rate_limited(e) else "error"
+                        self._span(provider, model, "complete", started, outcome, system_message + prompt)
+                        raise
+                    self._span(provider, model, "complete", started, "ok", system_message + prompt, response)
+                    return response
+            except Exception as e:
+                if not is_rate_limited(e) or attempt == self.retries:
+                    self.stats["errors"] += 1
+                    raise
+            # Back off outside the semaphore so queued calls are not blocked by the sleep
+            await self._backoff(attempt)
+
+    async def complete(self, session_prefix: str, system_message: str, prompt: str,
+                       provider: str = LLM_PROVIDER, model: str = LLM_MODEL) -> str:
+        """Complete a prompt; identical prompts already in flight share one upstream call"""
+        key = (provider, model, system_message, prompt)
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._call(provider, model, session_prefix, system_message, prompt))
+            self.inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self.stats["coalesced"] += 1
+        start = time.perf_counter()
+        try:
+            # Shielded so one caller disconnecting does not cancel the call for the others
+            return await asyncio.shield(task)
+        finally:
+            record_timing("llm", time.perf_counter() - start)
+
+    def _finish(self, key: tuple, task: asyncio.Task):
+        self.inflight.pop(key, None)
+        if not task.cancelled():
+            # Mark the exception retrieved even if every waiter has gone away
+            task.exception()
+
+    async def stream(self, session_prefix: str, system_message: str, prompt: str,
+                     provider: str = LLM_PROVIDER, model: str = LLM_MODEL):
+        """Yield response chunks; rate limits are retried only before the first chunk arrives"""
+        start = time.perf_counter()
+        try:
+            for attempt in range(self.retries + 1):
+                started = False
+                chunks = []
+                try:
+                    async with self._semaphore(provider):
+                        self.stats["calls"] += 1
+                        attempt_start = time.perf_counter()
+                        try:
+                            async for chunk in self.backend.stream(provider, model, session_prefix, system_message, prompt):
+                                started = True
+                                chunks.append(chunk)
+                                yield chunk
+                        except Exception as e:
+                            outcome = "rate_limited" if is_rate_limited(e) else "error"
+                            self._span(provider, model, "stream", attempt_start, outcome, system_message + prompt, "".join(chunks))
+                            raise
+                        self._span(provider, model, "stream", attempt_start, "ok", system_message + prompt, "".join(chunks))
+                    return
+                except Exception as e:
+                    if started or not is_rate_limited(e) or attempt == self.retries:
+                        self.stats["errors"] += 1
+                        raise
+                await self._backoff(attempt)
+        finally:
+            record_timing("llm", time.perf_counter() - start)
+
+def create_llm_backend():
+    if LLM_BACKEND == "stub":
+        return StubBackend(LLM_STUB_LATENCY_MS)
+    return EmergentBackend()
+
+llm_client = LLMClient(
+    create_llm_backend(),
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    retries=LLM_RATE_LIMIT_RETRIES,
+    backoff=LLM_RATE_LIMIT_BACKOFF_SECONDS
+)
+
+# ============ AI RESPONSE CACHE ============
+
+# key -> response text; the in-memory front tier in front of db.ai_cache
+ai_cache = TTLCache(maxsize=AI_CACHE_MEMORY_SIZE, ttl=AI_CACHE_MEMORY_TTL_SECONDS)
+ai_cache_stats = CacheStats()
+ai_cache_writes = 0
+
+def ai_cache_key(endpoint: str, system_message: str, prompt: str) -> str:
+    raw = json.dumps([endpoint, LLM_PROVIDER, LLM_MODEL, system_message, prompt])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+async def get_cached_response(key: str) -> Optional[str]:
+    response = ai_cache.get(key)
+    if response is not None:
+        return response
+    entry = await db.ai_cache.find_one_and_update(
+        {"key": key, "expires_at": {"$gt": datetime.now(timezone.utc)}},
+        {"$inc": {"hits": 1}},
+        {"_id": 0, "response": 1}
+    )
+    if not entry:
+        return None
+    ai_cache[key] = entry["response"]
+    return entry["response"]
+
+async def store_cached_response(key: str, endpoint: str, response: str):
+    global ai_cache_writes
+    ai_cache[key] = response
+    # BSON dates rather than ISO strings so the TTL index can expire entries
+    now = datetime.now(timezone.utc)
+    await db.ai_cache.update_one(
+        {"key": key},
+        {"$set": {
+            "key": key,
+            "endpoint": endpoint,
+            "model": f"{LLM_PROVIDER}/{LLM_MODEL}",
+            "response": response,
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=AI_CACHE_TTL_SECONDS),
+            "hits": 0
+        }},
+        upsert=True
+    )
+    ai_cache_writes += 1
+    if ai_cache_writes % AI_CACHE_PRUNE_EVERY == 0:
+        await prune_ai_cache()
+
+async def prune_ai_cache():
+    """Evict the oldest entries once db.ai_cache grows past AI_CACHE_MAX_ENTRIES"""
+    excess = await db.ai_cache.count_documents({}) - AI_CACHE_MAX_ENTRIES
+    if excess <= 0:
+        return
+    boundary = await db.ai_cache.find({}, {"_id": 0, "created_at": 1}) \
+        .sort("created_at", 1).skip(excess - 1).limit(1).to_list(1)
+    if boundary:
+        result = await db.ai_cache.delete_many({"created_at": {"$lte": boundary[0]["created_at"]}})
+        logger.info(f"Evicted {result.deleted_count} AI cache entries")
+
+async def lookup_ai_cache(key: str) -> Optional[str]:
+    try:
+        response = await get_cached_response(key)
+    except Exception as e:
+        logger.warning(f"AI cache read failed: {str(e)}")
+        response = None
+    if response is None:
+        ai_cache_stats.misses += 1
+    else:
+        ai_cache_stats.hits += 1
+    return response
+
+async def save_ai_cache(key: str, endpoint: str, response: str):
+    try:
+        await store_cached_response(key, endpoint, response)
+    except Exception as e:
+        logger.warning(f"AI cache write failed: {str(e)}")
+
+async def complete_cached(endpoint: str, session_prefix: str, system_message: str,
+                          prompt: str, force_refresh: bool = False):
+    """Return (response, cached), answering repeated prompts from the AI response cache"""
+    key = ai_cache_key(endpoint, system_message, prompt)
+    if not force_refresh:
+        response = await lookup_ai_cache(key)
+        if response is not None:
+            return response, True
+
+    response = await llm_client.complete(session_prefix, system_message, prompt)
+    await save_ai_cache(key, endpoint, response)
+    return response, False
+
+async def load_email_prompt(lead_id: str, template_id: Optional[str], user_id: str) -> str:
+    lead = await db.leads.find_one({"id": lead_id, "user_id": user_id}, {"_id": 0})
+    if not lead:
+        raise HTTPException(status_code=404, detail="Lead not found")
+    
+    template = None
+    if template_id:
+        template = await db.templates.find_one({"id": template_id, "user_id": user_id}, {"_id": 0})
+    return build_email_prompt(lead, template)
+
+# ============ AI ROUTES ============
+
+@api_router.post("/ai/research")
+async def ai_research_company(data: AIResearchRequest, user: dict = Depends(get_current_user)):
+    if not llm_client.configured:
+        raise HTTPException(status_code=500, detail="LLM API key not configured")
+    
+    try:
+        prompt = build_research_prompt(data.company_name, data.industry, data.additional_context)
+        response, cached = await complete_cached(
+            "research", f"research_{user['id']}", RESEARCH_SYSTEM_MESSAGE, prompt, data.force_refresh
+        )
+        return {"research": response, "company_name": data.company_name, "cached": cached}
+    except Exception as e:
+        logger.error(f"AI Research error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"AI research failed: {str(e)}")
+
+@api_router.post("/ai/discover-contacts")
+async def ai_discover_contacts(data: AIContactDiscoveryRequest, user: dict = Depends(get_current_user)):
+    if not llm_client.configured:
+        raise HTTPException(status_code=500, detail="LLM API key not configured")
+    
+    try:
+        prompt = build_contacts_prompt(data.company_name)
+        response, cached = await complete_cached(
+            "discover-contacts", f"contacts_{user['id']}", CONTACTS_SYSTEM_MESSAGE, prompt, data.force_refresh
+        )
+        return {"contacts_research": response, "company_name": data.company_name, "cached": cached}
+    except Exception as e:
+        logger.error(f"AI Contact Discovery error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"AI contact discovery failed: {str(e)}")
+
+@api_router.post("/ai/generate-email")
+async def ai_generate_email(lead_id: str, template_id: Optional[str] = None, force_refresh: bool = False,
+                            user: dict = Depends(get_current_user)):
+    if not llm_client.configured:
+        raise HTTPException(status_code=500, detail="LLM API key not configured")
+    
+    prompt = await load_email_prompt(lead_id, template_id, user["id"])
+    
+    try:
+        response, cached = await complete_cached(
+            "generate-email", f"email_{user['id']}", EMAIL_SYSTEM_MESSAGE, prompt, force_refresh
+        )
+        return {"email": response, "lead_id": lead_id, "cached": cached}
     except Exception as e:
         logger.error(f"AI Email Generation error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"AI email generation failed: {str(e)}")
 
+# ============ AI STREAMING ROUTES ============
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_completion(request: Request, endpoint: str, session_prefix: str, system_message: str, prompt: str,
+                   force_refresh: bool, meta: dict, on_complete=None) -> StreamingResponse:
+    """Stream an LLM answer as server-sent events: start, token..., done (or error)"""
+    key = ai_cache_key(endpoint, system_message, prompt)
+
+    async def generate():
+        yield sse_event("start", meta)
+        if not force_refresh:
+            response = await lookup_ai_cache(key)
+            if response is not None:
+                yield sse_event("token", {"text": response})
+                if on_complete:
+                    await on_complete(response)
+                yield sse_event("done", {**meta, "cached": True})
+                return
+
+        queue = asyncio.Queue()
+
+        async def produce():
+            try:
+                async for chunk in llm_client.stream(session_prefix, system_message, prompt):
+                    await queue.put(("token", chunk))
+                await queue.put(("end", None))
+            except Exception as e:
+                await queue.put(("error", e))
+
+        producer = asyncio.create_task(produce())
+        parts = []
+        try:
+            while True:
+                try:
+                    kind, value = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                if kind == "error":
+                    logger.error(f"AI stream error ({endpoint}): {str(value)}")
+                    yield sse_event("error", {"detail": f"AI {endpoint} failed: {str(value)}"})
+                    return
+                if kind == "end":
+                    break
+                parts.append(value)
+                yield sse_event("token", {"text": value})
+
+            response = "".join(parts)
+            await save_ai_cache(key, endpoint, response)
+            if on_complete:
+                await on_complete(response)
+            yield sse_event("done", {**meta, "cached": False})
+        finally:
+            # Runs on client disconnect too, so the upstream call is abandoned
+            producer.cancel()
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.post("/ai/research/stream")
+async def ai_research_company_stream(data: AIResearchRequest, request: Request, user: dict = Depends(get_current_user)):
+    if not llm_client.configured:
+        raise HTTPException(status_code=500, detail="LLM API key not configured")
+    
+    on_complete = None
+    if data.lead_id:
+        lead = await db.leads.find_one({"id": data.lead_id, "user_id": user["id"]}, {"_id": 0, "id": 1})
+        if not lead:
+            raise HTTPException(status_code=404, detail="Lead not found")
+
+        async def on_complete(research: str):
+            fields = {"ai_insights": research, "updated_at": datetime.now(timezone.utc).isoformat()}
+            await db.leads.update_one({"id": data.lead_id, "user_id": user["id"]}, {"$set": fields})
+            await bump_versions(user["id"], "leads")
+            publish_change(user["id"], "leads", "update", data.lead_id, fields=fields)
+
+    prompt = build_research_prompt(data.company_name, data.industry, data.additional_context)
+    return sse_completion(
+        request, "research", f"research_{user['id']}", RESEARCH_SYSTEM_MESSAGE, prompt, data.force_refresh,
+        {"company_name": data.company_name, "lead_id": data.lead_id}, on_complete
+    )
+
+@api_router.post("/ai/discover-contacts/stream")
+async def ai_discover_contacts_stream(data: AIContactDiscoveryRequest, request: Request,
+                                      user: dict = Depends(get_current_user)):
+    if not llm_client.configured:
+        raise HTTPException(status_code=500, detail="LLM API key not configured")
+    
+    prompt = build_contacts_prompt(data.company_name)
+    return sse_completion(
+        request, "discover-contacts", f"contacts_{user['id']}", CONTACTS_SYSTEM_MESSAGE, prompt, data.force_refresh,
+        {"company_name": data.company_name}
+    )
+
+@api_router.post("/ai/generate-email/stream")
+async def ai_generate_email_stream(request: Request, lead_id: str, template_id: Optional[str] = None,
+                                   force_refresh: bool = False, user: dict = Depends(get_current_user)):
+    if not llm_client.configured:
+        raise HTTPException(status_code=500, detail="LLM API key not configured")
+    
+    prompt = await load_email_prompt(lead_id, template_id, user["id"])
+    return sse_completion(
+        request, "generate-email", f"email_{user['id']}", EMAIL_SYSTEM_MESSAGE, prompt, force_refresh,
+        {"lead_id": lead_id}
+    )
+
+# ============ AI BATCH JOBS ============
+
+# Shared across jobs so total LLM fan-out stays bounded however many batches run
+ai_batch_semaphore = asyncio.Semaphore(AI_BATCH_CONCURRENCY)
+# Strong references to running jobs so they are not garbage collected mid-flight
+background_tasks = set()
+
+def spawn_background(coro):
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+async def with_retries(fn, *args, retries: int = AI_BATCH_MAX_RETRIES, backoff: float = AI_BATCH_BACKOFF_SECONDS):
+    """Await fn(*args), retrying failures with jittered exponential backoff"""
+    for attempt in range(retries + 1):
+        try:
+            return await fn(*args)
+        except Exception:
+            if attempt == retries:
+                raise
+            await asyncio.sleep(backoff * 2 ** attempt + random.uniform(0, backoff))
+
+async def research_batch_item(item: dict, user_id: str, force_refresh: bool, progress: Counter):
+    try:
+        async with ai_batch_semaphore:
+            prompt = build_research_prompt(item["company_name"], item.get("industry"), None)
+            response, _ = await with_retries(
+                complete_cached, "research", f"research_{user_id}", RESEARCH_SYSTEM_MESSAGE, prompt, force_refresh
+            )
+        if item.get("lead_id"):
+            fields = {"ai_insights": response, "updated_at": datetime.now(timezone.utc).isoformat()}
+            await db.leads.update_one({"id": item["lead_id"], "user_id": user_id}, {"$set": fields})
+            await bump_versions(user_id, "leads")
+            publish_change(user_id, "leads", "update", item["lead_id"], fields=fields)
+        else:
+            item["research"] = response
+        item["status"] = "completed"
+    except Exception as e:
+        logger.error(f"AI batch research error for {item['company_name']}: {str(e)}")
+        item["status"] = "failed"
+        item["error"] = str(e)
+    progress[item["status"]] += 1
+    await report_job_progress(dict(progress))
+
+def check_research_batch(data: AIBatchResearchRequest) -> int:
+    if not llm_client.configured:
+        raise HTTPException(status_code=500, detail="LLM API key not configured")
+    total = len(data.lead_ids) + len(data.company_names)
+    if total == 0:
+        raise HTTPException(status_code=400, detail="Provide lead_ids or company_names")
+    if total > AI_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {AI_BATCH_MAX_ITEMS} items per batch")
+    return total
+
+async def run_research_batch(data: AIBatchResearchRequest, user: dict) -> dict:
+    """Research every lead and company in the batch, reporting counts as job progress; per-item failures do not fail the job"""
+    total = check_research_batch(data)
+    leads = await db.leads.find(
+        {"id": {"$in": data.lead_ids}, "user_id": user["id"]},
+        {"_id": 0, "id": 1, "company_name": 1, "industry": 1}
+    ).to_list(len(data.lead_ids))
+    leads_by_id = {lead["id"]: lead for lead in leads}
+
+    items = []
+    for lead_id in data.lead_ids:
+        lead = leads_by_id.get(lead_id)
+        if lead:
+            items.append({"lead_id": lead_id, "company_name": lead["company_name"],
+                          "industry": lead.get("industry"), "status": "pending"})
+        else:
+            items.append({"lead_id": lead_id, "company_name": None, "status": "failed", "error": "Lead not found"})
+    items.extend({"lead_id": None, "company_name": name, "status": "pending"} for name in data.company_names)
+
+    progress = Counter({"total": total, "completed": 0, "failed": sum(1 for item in items if item["status"] == "failed")})
+    await report_job_progress(dict(progress))
+    await asyncio.gather(*(
+        research_batch_item(item, user["id"], data.force_refresh, progress)
+        for item in items if item["status"] == "pending"
+    ))
+    for item in items:
+        item.pop("industry", None)
+    return {**progress, "items": items}
+
+@api_router.post("/ai/research/batch", status_code=202)
+async def ai_research_batch(data: AIBatchResearchRequest, user: dict = Depends(get_current_user)):
+    """Queue research for many leads or companies; poll GET /jobs/{id} for progress and /jobs/{id}/result for the items"""
+    total = check_research_batch(data)
+    job = await enqueue_job("ai_research_batch", data.model_dump(), user["id"])
+    return {"job_id": job["id"], "type": job["type"], "status": job["status"], "total": total}
+
+# ============ AI LEAD SCORING ============
+
+# Lead fields the score depends on; changing any of them queues the lead for re-scoring
+SCORED_FIELDS = {"company_name", "industry", "company_size", "website", "notes"}
+
+SCORING_SYSTEM_MESSAGE = """You are an expert B2B sales analyst qualifying leads for an HR services provider.
+            Score each company's need for outsourced HR services from 1 (no need) to 10 (urgent need).
+            Respond with JSON only."""
+
+scoring_wakeup = asyncio.Event()
+scoring_stats = {"batches": 0, "scored": 0, "skipped": 0, "failed": 0}
+
+def scoring_hash(lead: dict) -> str:
+    raw = json.dumps([lead.get(field) for field in sorted(SCORED_FIELDS)])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def build_scoring_prompt(leads: List[dict]) -> str:
+    companies = "\n".join(
+        json.dumps({
+            "id": lead["id"],
+            "company": lead["company_name"],
+            "industry": lead.get("industry"),
+            "size": lead.get("company_size"),
+            "website": lead.get("website"),
+            "notes": lead.get("notes")
+        })
+        for lead in leads
+    )
+    return f"""Qualify these companies as prospects for HR services:
+
+{companies}
+
+Return a JSON array with one object per company, in any order:
+[{{"id": "<id>", "score": <integer 1-10>, "insights": "<2-3 sentences on HR needs and outreach angle>"}}]"""
+
+def parse_scores(text: str) -> dict:
+    """Map lead id -> (score, insights) from an LLM answer, ignoring malformed entries"""
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end <= start:
+        return {}
+    try:
+        entries = json.loads(text[start:end + 1])
+    except ValueError:
+        return {}
+    scores = {}
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        try:
+            score = int(entry.get("score"))
+        except (TypeError, ValueError):
+            continue
+        if isinstance(entry.get("id"), str) and 1 <= score <= 10:
+            scores[entry["id"]] = (score, str(entry.get("insights") or "").strip())
+    return scores
+
+async def claim_scoring_batch() -> List[dict]:
+    """Lease up to AI_SCORING_BATCH_SIZE pending leads of one user so concurrent workers never share one"""
+    batch = []
+    now = datetime.now(timezone.utc)
+    query = {
+        "ai_score_pending": True,
+        "score_manual": {"$ne": True},
+        "$or": [{"ai_score_lease": None}, {"ai_score_lease": {"$lt": now}}]
+    }
+    for _ in range(AI_SCORING_BATCH_SIZE):
+        lead = await db.leads.find_one_and_update(
+            query,
+            {"$set": {"ai_score_lease": now + timedelta(seconds=AI_SCORING_LEASE_SECONDS)}},
+            {"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        if not lead:
+            break
+        # One prompt never mixes tenants: their lead text must not reach or steer each other's scores
+        query = {**query, "user_id": lead["user_id"]}
+        batch.append(lead)
+    return batch
+
+async def finish_scoring(lead: dict, update: dict, inc: Optional[dict] = None) -> bool:
+    # Matching the scored fields leaves leads edited mid-flight pending for another pass,
+    # and a score the rep typed in meanwhile wins over this one
+    ops = {"$set": {**update, "ai_score_lease": None}}
+    if inc:
+        ops["$inc"] = inc
+    result = await db.leads.update_one(
+        {"id": lead["id"], "score_manual": {"$ne": True}, **{field: lead.get(field) for field in SCORED_FIELDS}},
+        ops
+    )
+    if result.matched_count:
+        return True
+    # Release the lease so an edited lead is picked up again without waiting for it to expire
+    await db.leads.update_one({"id": lead["id"]}, {"$set": {"ai_score_lease": None}})
+    return False
+
+async def score_batch(leads: List[dict]):
+    todo = []
+    for lead in leads:
+        if lead.get("ai_score_hash") == scoring_hash(lead):
+            scoring_stats["skipped"] += 1
+            await finish_scoring(lead, {"ai_score_pending": False})
+        else:
+            todo.append(lead)
+    if not todo:
+        return
+
+    scoring_stats["batches"] += 1
+    try:
+        scores = parse_scores(await llm_client.complete("scoring", SCORING_SYSTEM_MESSAGE, build_scoring_prompt(todo)))
+    except Exception as e:
+        logger.error(f"AI scoring batch error: {str(e)}")
+        scores = {}
+
+    now = datetime.now(timezone.utc).isoformat()
+    scored = []
+    for lead in todo:
+        if lead["id"] not in scores:
+            scoring_stats["failed"] += 1
+            attempts = lead.get("ai_score_attempts", 0) + 1
+            await finish_scoring(
+                lead,
+                {"ai_score_pending": attempts < AI_SCORING_MAX_ATTEMPTS, "ai_score_error": "No valid score returned"},
+                {"ai_score_attempts": 1}
+            )
+            continue
+        score, insights = scores[lead["id"]]
+        update = {
+            "qualification_score": score,
+            "ai_score_hash": scoring_hash(lead),
+            "ai_score_pending": False,
+            "ai_score_attempts": 0,
+            "ai_score_error": None,
+            "ai_scored_at": now
+        }
+        # Never overwrite fuller research a rep already saved on the lead
+        if insights and not lead.get("ai_insights"):
+            update["ai_insights"] = insights
+        if await finish_scoring(lead, update):
+            scored.append((lead, update))
+            scoring_stats["scored"] += 1
+    for user_id in {lead["user_id"] for lead, _ in scored}:
+        await bump_versions(user_id, "leads")
+    for lead, update in scored:
+        publish_change(lead["user_id"], "leads", "update", lead["id"], fields=update)
+
+async def scoring_worker():
+    while True:
+        try:
+            batch = await claim_scoring_batch()
+            if batch:
+                await score_batch(batch)
+                continue
+        except Exception as e:
+            logger.error(f"AI scoring worker error: {str(e)}")
+        scoring_wakeup.clear()
+        try:
+            await asyncio.wait_for(scoring_wakeup.wait(), timeout=AI_SCORING_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+async def watch_scoring_changes():
+    """Wake the workers on lead changes made by other processes, where change streams exist"""
+    pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}]
+    try:
+        async with db.leads.watch(pipeline) as stream:
+            async for _ in stream:
+                scoring_wakeup.set()
+    except OperationFailure as e:
+        logger.info(f"Change streams unavailable, scoring workers poll instead: {str(e)}")
+    except Exception as e:
+        logger.warning(f"Scoring change stream stopped: {str(e)}")
+
+@api_router.post("/ai/score")
+async def queue_lead_scoring(data: AIScoreRequest, user: dict = Depends(get_current_user)):
+    """Queue leads (all of the user's unscored leads by default) for background scoring"""
+    query = {"user_id": user["id"]}
+    if data.lead_ids is not None:
+        query["id"] = {"$in": data.lead_ids}
+    update = {"ai_score_pending": True, "ai_score_attempts": 0}
+    if data.force:
+        # Forcing also hands manually scored leads back to the AI
+        update.update(ai_score_hash=None, score_manual=False)
+    else:
+        query.update(ai_score_hash=None, score_manual={"$ne": True})
+    result = await db.leads.update_many(query, {"$set": update})
+    scoring_wakeup.set()
+    return {"queued": result.modified_count, "scoring_enabled": AI_SCORING_ENABLED}
+
+# ============ JOB QUEUE ============
+
+# Job type -> (payload model, handler); handlers are the route functions, so a job returns what the route would
+JOB_TYPES = {
+    "ai_research": (AIResearchRequest, lambda data, user: ai_research_company(data, user)),
+    "ai_discover_contacts": (AIContactDiscoveryRequest, lambda data, user: ai_discover_contacts(data, user)),
+    "ai_generate_email": (GenerateEmailJob, lambda data, user: ai_generate_email(
+        data.lead_id, data.template_id, data.force_refresh, user)),
+    "seed_leads": (SeedLeadsJob, lambda data, user: seed_example_leads(user)),
+    "ai_research_batch": (AIBatchResearchRequest, run_research_batch),
+    "lead_duplicates": (FindDuplicatesJob, lambda data, user: find_lead_duplicate_clusters(user["id"])),
+    "contact_duplicates": (FindDuplicatesJob, lambda data, user: find_contact_duplicate_clusters(user["id"])),
+}
+
+job_wakeup = asyncio.Event()
+job_shutdown = asyncio.Event()
+# (job id, worker id) of the job the current task is running, for handlers that report progress
+current_job = contextvars.ContextVar("current_job", default=None)
+
+class PermanentJobError(Exception):
+    """A failure that retrying cannot fix"""
+
+async def enqueue_job(job_type: str, payload: dict, user_id: str, priority: int = 0,
+                      max_attempts: Optional[int] = None) -> dict:
+    now = datetime.now(timezone.utc)
+    job = {
+        "id": str(uuid.uuid4()),
+        "type": job_type,
+        "status": "queued",
+        "priority": priority,
+        "payload": payload,
+        "result": None,
+        "progress": None,
+        "error": None,
+        "attempts": 0,
+        "max_attempts": max_attempts or JOB_MAX_ATTEMPTS,
+        "run_at": now,
+        "lease_expires_at": None,
+        "worker_id": None,
+        "created_at": now.isoformat(),
+        "updated_at": now.isoformat(),
+        "started_at": None,
+        "finished_at": None,
+        "expires_at": None,
+        "user_id": user_id
+    }
+    await db.jobs.insert_one(job)
+    job.pop("_id", None)
+    job_wakeup.set()
+    return job
+
+async def report_job_progress(progress: dict):
+    """Record a running job's progress for GET /jobs/{id}; a no-op outside a job"""
+    job = current_job.get()
+    if job is None:
+        return
+    job_id, worker_id = job
+    await db.jobs.update_one(
+        {"id": job_id, "worker_id": worker_id, "status": "running"},
+        {"$set": {"progress": progress, "updated_at": datetime.now(timezone.utc).isoformat()}}
+    )
+
+async def claim_job(worker_id: str) -> Optional[dict]:
+    """Lease the highest-priority due job; it becomes visible again if the lease is not renewed"""
+    now = datetime.now(timezone.utc)
+    return await db.jobs.find_one_and_update(
+        {"status": "queued", "run_at": {"$lte": now}},
+        {
+            "$set": {
+                "status": "running",
+                "worker_id": worker_id,
+                "lease_expires_at": now + timedelta(seconds=JOB_VISIBILITY_TIMEOUT_SECONDS),
+                "started_at": now.isoformat(),
+                "updated_at": now.isoformat()
+            },
+            "$inc": {"attempts": 1}
+        },
+        {"_id": 0},
+        sort=[("priority", DESCENDING), ("run_at", ASCENDING)],
+        return_document=ReturnDocument.AFTER
+    )
+
+async def keep_lease(job_id: str, worker_id: str):
+    while True:
+        await asyncio.sleep(JOB_VISIBILITY_TIMEOUT_SECONDS / 3)
+        await db.jobs.update_one(
+            {"id": job_id, "worker_id": worker_id, "status": "running"},
+            {"$set": {"lease_expires_at": datetime.now(timezone.utc) + timedelta(seconds=JOB_VISIBILITY_TIMEOUT_SECONDS)}}
+        )
+
+def job_failure_update(job: dict, error: str, permanent: bool) -> dict:
+    """Requeue with backoff, or dead-letter once attempts run out or the error is permanent"""
+    now = datetime.now(timezone.utc)
+    update = {"error": error, "worker_id": None, "lease_expires_at": None, "updated_at": now.isoformat()}
+    if permanent or job["attempts"] >= job["max_attempts"]:
+        return {**update, "status": "dead", "finished_at": now.isoformat(),
+                "expires_at": now + timedelta(seconds=JOB_DEAD_RETENTION_SECONDS)}
+    delay = JOB_RETRY_BACKOFF_SECONDS * 2 ** (job["attempts"] - 1) + random.uniform(0, JOB_RETRY_BACKOFF_SECONDS)
+    return {**update, "status": "queued", "run_at": now + timedelta(seconds=delay)}
+
+async def settle_job(job: dict, worker_id: str, update: dict, inc: Optional[dict] = None):
+    ops = {"$set": update}
+    if inc:
+        ops["$inc"] = inc
+    result = await db.jobs.update_one({"id": job["id"], "worker_id": worker_id, "status": "running"}, ops)
+    if result.modified_count == 0:
+        logger.warning(f"Job {job['id']} lost its lease before finishing; outcome discarded")
+
+async def run_job(job: dict, worker_id: str):
+    heartbeat = asyncio.create_task(keep_lease(job["id"], worker_id))
+    job_context = current_job.set((job["id"], worker_id))
+    start = time.perf_counter()
+    outcome = "completed"
+    try:
+        if job["type"] not in JOB_TYPES:
+            raise PermanentJobError(f"Unknown job type {job['type']}")
+        model, handler = JOB_TYPES[job["type"]]
+        user = await db.users.find_one({"id": job["user_id"]}, {"_id": 0, "password": 0})
+        if not user:
+            raise PermanentJobError("User not found")
+        try:
+            data = model(**job["payload"])
+        except ValidationError as e:
+            raise PermanentJobError(format_error(e))
+        result = jsonable_encoder(await handler(data, user))
+        now = datetime.now(timezone.utc)
+        await settle_job(job, worker_id, {
+            "status": "completed",
+            "result": result,
+            "error": None,
+            "worker_id": None,
+            "lease_expires_at": None,
+            "updated_at": now.isoformat(),
+            "finished_at": now.isoformat(),
+            "expires_at": now + timedelta(seconds=JOB_RETENTION_SECONDS)
+        })
+    except asyncio.CancelledError:
+        # Shutting down mid-job: hand it back without spending an attempt
+        outcome = "released"
+        await settle_job(job, worker_id, {
+            "status": "queued", "worker_id": None, "lease_expires_at": None,
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        }, {"attempts": -1})
+        raise
+    except Exception as e:
+        # Client errors (bad ids, missing leads) will fail the same way on every attempt
+        permanent = isinstance(e, PermanentJobError) or (isinstance(e, HTTPException) and e.status_code < 500)
+        error = e.detail if isinstance(e, HTTPException) else str(e)
+        logger.error(f"Job {job['id']} ({job['type']}) attempt {job['attempts']} failed: {error}")
+        update = job_failure_update(job, error, permanent)
+        outcome = "retried" if update["status"] == "queued" else "dead"
+        await settle_job(job, worker_id, update)
+    finally:
+        current_job.reset(job_context)
+        heartbeat.cancel()
+        job_seconds.observe(time.perf_counter() - start, job["type"], outcome)
+
+async def requeue_expired_jobs():
+    """Return jobs whose worker died (lease expired) to the queue, or dead-letter them"""
+    now = datetime.now(timezone.utc)
+    async for job in db.jobs.find(
+        {"status": "running", "lease_expires_at": {"$lt": now}},
+        {"_id": 0, "id": 1, "type": 1, "attempts": 1, "max_attempts": 1, "worker_id": 1}
+    ):
+        logger.warning(f"Job {job['id']} ({job['type']}) lease expired on {job['worker_id']}")
+        await settle_job(job, job["worker_id"], job_failure_update(job, "Visibility timeout expired", False))
+
+async def job_worker(worker_id: str):
+    while not job_shutdown.is_set():
+        try:
+            job = await claim_job(worker_id)
+            if job:
+                await run_job(job, worker_id)
+                continue
+        except Exception as e:
+            logger.error(f"Job worker error: {str(e)}")
+        job_wakeup.clear()
+        try:
+            await asyncio.wait_for(job_wakeup.wait(), timeout=JOB_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+async def reap_expired_jobs():
+    while not job_shutdown.is_set():
+        try:
+            await requeue_expired_jobs()
+        except Exception as e:
+            logger.error(f"Job reaper error: {str(e)}")
+        try:
+            await asyncio.wait_for(job_shutdown.wait(), timeout=JOB_REAP_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+async def run_job_workers(concurrency: int):
+    """Run job workers and the lease reaper until job_shutdown is set"""
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    logger.info(f"Starting {concurrency} job workers as {prefix}")
+    await asyncio.gather(reap_expired_jobs(), *(job_worker(f"{prefix}:{i}") for i in range(concurrency)))
+
+def stop_job_workers():
+    """Stop claiming jobs; workers finish the job in hand and exit"""
+    job_shutdown.set()
+    job_wakeup.set()
+
+@api_router.post("/jobs", status_code=202)
+async def create_job(data: JobCreate, user: dict = Depends(get_current_user)):
+    """Queue a long-running operation for the worker instead of running it in the request"""
+    model, _ = JOB_TYPES[data.type]
+    try:
+        model(**data.payload)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=format_error(e))
+    job = await enqueue_job(data.type, data.payload, user["id"], data.priority, data.max_attempts)
+    return {"job_id": job["id"], "type": job["type"], "status": job["status"]}
+
+@api_router.get("/jobs")
+async def get_jobs(
+    response: Response,
+    job_status: Optional[Literal["queued", "running", "completed", "dead"]] = Query(None, alias="status"),
+    cursor: Optional[str] = None,
+    limit: int = Query(LIST_PAGE_SIZE, ge=1, le=LIST_PAGE_SIZE_MAX),
+    user: dict = Depends(get_current_user)
+):
+    query = {"user_id": user["id"]}
+    if job_status:
+        query["status"] = job_status
+    projection = {"_id": 0, "user_id": 0, "result": 0, "payload": 0}
+    jobs = await fetch_page(db.jobs, query, projection, "created_at", cursor, limit, response)
+    return lean_response(jobs, response)
+
+@api_router.get("/jobs/{job_id}")
+async def get_job(job_id: str, user: dict = Depends(get_current_user)):
+    job = await db.jobs.find_one({"id": job_id, "user_id": user["id"]}, {"_id": 0, "user_id": 0, "result": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@api_router.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str, response: Response, user: dict = Depends(get_current_user)):
+    job = await db.jobs.find_one(
+        {"id": job_id, "user_id": user["id"]}, {"_id": 0, "status": 1, "result": 1, "error": 1}
+    )
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] == "completed":
+        return job["result"]
+    if job["status"] == "dead":
+        raise HTTPException(status_code=409, detail=f"Job failed: {job['error']}")
+    response.status_code = 202
+    response.headers["Retry-After"] = str(max(1, int(JOB_POLL_SECONDS)))
+    return {"status": job["status"]}
+
+@api_router.post("/jobs/{job_id}/retry", status_code=202)
+async def retry_job(job_id: str, user: dict = Depends(get_current_user)):
+    """Move a dead-lettered job back onto the queue with a fresh attempt budget"""
+    now = datetime.now(timezone.utc)
+    job = await db.jobs.find_one_and_update(
+        {"id": job_id, "user_id": user["id"], "status": "dead"},
+        {"$set": {"status": "queued", "attempts": 0, "run_at": now, "error": None,
+                  "finished_at": None, "expires_at": None, "updated_at": now.isoformat()}},
+        {"_id": 0, "id": 1, "status": 1}
+    )
+    if not job:
+        exists = await db.jobs.find_one({"id": job_id, "user_id": user["id"]}, {"_id": 1})
+        raise HTTPException(status_code=409 if exists else 404, detail="Only dead jobs can be retried" if exists else "Job not found")
+    job_wakeup.set()
+    return {"job_id": job_id, "status": "queued"}
+
+@api_router.delete("/jobs/{job_id}")
+async def delete_job(job_id: str, user: dict = Depends(get_current_user)):
+    """Cancel a queued job or discard a finished one; running jobs cannot be deleted"""
+    result = await db.jobs.delete_one({"id": job_id, "user_id": user["id"], "status": {"$ne": "running"}})
+    if result.deleted_count == 0:
+        exists = await db.jobs.find_one({"id": job_id, "user_id": user["id"]}, {"_id": 1})
+        raise HTTPException(status_code=409 if exists else 404, detail="Job is running" if exists else "Job not found")
+    return {"message": "Job deleted"}
+
 # ============ HEALTH CHECK ============
 
 @api_router.get("/")
@@ -518,7 +3698,44 @@ async def root():
 
 @api_router.get("/health")
 async def health():
-    return {"status": "healthy", "timestamp": datetime.now(timezone.utc).isoformat()}
+    return {
+        "status": "healthy",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "cache": cache_stats(),
+        "llm": {"backend": llm_client.backend.name, **llm_client.stats},
+        "scoring": {"enabled": AI_SCORING_ENABLED, **scoring_stats}
+    }
+
+METRICS = [
+    http_request_seconds,
+    db_command_seconds,
+    llm_request_seconds,
+    llm_tokens,
+    password_seconds,
+    job_seconds,
+    Gauge("cache_entries", "Entries held by in-process caches", ("cache",),
+          lambda: {(name,): stats["size"] for name, stats in cache_stats().items()}),
+    Gauge("cache_lookups", "In-process cache lookups since start", ("cache", "result"),
+          lambda: {(name, result): stats[result] for name, stats in cache_stats().items() for result in ("hits", "misses")}),
+    Gauge("llm_client_events", "Shared LLM client events since start", ("event",),
+          lambda: {(event,): count for event, count in llm_client.stats.items()}),
+    Gauge("llm_inflight_calls", "Distinct LLM calls currently in flight", (),
+          lambda: {(): len(llm_client.inflight)}),
+    Gauge("password_jobs_pending", "bcrypt jobs queued or running", (),
+          lambda: {(): password_jobs_pending}),
+    Gauge("background_tasks", "Background jobs and workers currently running", (),
+          lambda: {(): len(background_tasks)}),
+]
+
+@api_router.get("/metrics")
+async def metrics(request: Request):
+    """Prometheus text exposition of request, DB, LLM and bcrypt timings"""
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return Response("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4; charset=utf-8")
 
 # ============ SEED DATA ============
 
@@ -541,37 +3758,247 @@ EXAMPLE_LEADS = [
 @api_router.post("/leads/seed")
 async def seed_example_leads(user: dict = Depends(get_current_user)):
     """Populate the database with example leads for each industry"""
-    created_count = 0
     now = datetime.now(timezone.utc).isoformat()
+    # Keyed on the normalized name, so a rep's "Acme, Inc." stops the example "Acme Inc" from being added
+    ops = [
+        UpdateOne(
+            {"user_id": user["id"], "company_key": normalize_company(lead_data["company_name"])},
+            {"$setOnInsert": {
+                "id": str(uuid.uuid4()),
+                "company_name": lead_data["company_name"],
+                "industry": lead_data["industry"],
+                "company_size": lead_data["company_size"],
+                "website": lead_data["website"],
+                "status": "new",
+                "notes": lead_data["notes"],
+                "qualification_score": None,
+                "ai_insights": None,
+                "ai_score_pending": True,
+                **company_fields(lead_data),
+                "created_at": now,
+                "updated_at": now,
+                "user_id": user["id"]
+            }},
+            upsert=True
+        )
+        for lead_data in EXAMPLE_LEADS
+    ]
+    # Duplicate key errors only mean a concurrent call inserted the lead first
+    upserted, _, write_errors = await bulk_upsert(db.leads, ops)
+    created_count = len(upserted)
+    unexpected = [err for err in write_errors if err.get("code") != 11000]
+    if unexpected:
+        logger.error(f"Seeding example leads failed: {unexpected[0].get('errmsg')}")
+        raise HTTPException(status_code=500, detail="Seeding example leads failed")
+    deltas = Counter()
+    for index in upserted:
+        deltas.update(lead_stat_deltas({**EXAMPLE_LEADS[index], "status": "new"}))
+    await apply_lead_stats(user["id"], deltas)
+    if created_count:
+        await bump_versions(user["id"], "leads")
+        publish_change(user["id"], "leads", "invalidate")
+        scoring_wakeup.set()
     
-    for lead_data in EXAMPLE_LEADS:
-        # Check if lead already exists for this user
-        existing = await db.leads.find_one({
-            "company_name": lead_data["company_name"],
-            "user_id": user["id"]
+    return {
+        "message": f"Created {created_count} example leads",
+        "total_examples": len(EXAMPLE_LEADS),
+        "created": created_count,
+        "skipped": len(EXAMPLE_LEADS) - created_count
+    }
+
+# ============ INDEXES ============
+
+INDEXES = {
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "leads": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("updated_at", DESCENDING), ("id", DESCENDING)], name="user_updated"),
+        IndexModel([("user_id", ASCENDING), ("status", ASCENDING), ("updated_at", DESCENDING), ("id", DESCENDING)], name="user_status_updated"),
+        IndexModel([("user_id", ASCENDING), ("company_name", ASCENDING)], name="user_company", unique=True),
+        IndexModel([("user_id", ASCENDING), ("company_key", ASCENDING)], name="user_company_key"),
+        IndexModel([("user_id", ASCENDING), ("website_domain", ASCENDING)], name="user_website_domain"),
+        IndexModel([("user_id", ASCENDING), ("company_lsh", ASCENDING)], name="user_company_lsh"),
+        IndexModel([("user_id", ASCENDING), ("industry", ASCENDING), ("updated_at", DESCENDING)], name="user_industry_updated"),
+        IndexModel([("user_id", ASCENDING), ("company_size", ASCENDING), ("updated_at", DESCENDING)], name="user_size_updated"),
+        IndexModel([("user_id", ASCENDING), ("qualification_score", DESCENDING)], name="user_score"),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created"),
+        IndexModel(
+            [("ai_score_pending", ASCENDING)],
+            name="score_pending",
+            partialFilterExpression={"ai_score_pending": True}
+        ),
+        IndexModel(
+            [("user_id", ASCENDING), ("ai_score_pending", ASCENDING)],
+            name="user_score_pending",
+            partialFilterExpression={"ai_score_pending": True}
+        ),
+        IndexModel(
+            [("user_id", ASCENDING), ("company_name", TEXT), ("notes", TEXT), ("ai_insights", TEXT)],
+            name="user_text",
+            weights={"company_name": 10, "notes": 2, "ai_insights": 1},
+            default_language="english"
+        ),
+    ],
+    "contacts": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="user_created"),
+        IndexModel([("user_id", ASCENDING), ("lead_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="user_lead_created"),
+        IndexModel([("lead_id", ASCENDING)], name="lead"),
+        IndexModel([("user_id", ASCENDING), ("email_norm", ASCENDING)], name="user_email"),
+        IndexModel([("user_id", ASCENDING), ("email_domain", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="user_domain_created"),
+        IndexModel([("user_id", ASCENDING), ("linkedin_handle", ASCENDING)], name="user_linkedin"),
+        IndexModel([("user_id", ASCENDING), ("phone_norm", ASCENDING)], name="user_phone"),
+    ],
+    "templates": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING)], name="user"),
+    ],
+    "ai_cache": [
+        IndexModel([("key", ASCENDING)], name="key_unique", unique=True),
+        IndexModel([("expires_at", ASCENDING)], name="expires_ttl", expireAfterSeconds=0),
+        IndexModel([("created_at", ASCENDING)], name="created"),
+    ],
+    "lead_stats": [
+        IndexModel([("user_id", ASCENDING)], name="user_unique", unique=True),
+    ],
+    "collection_versions": [
+        IndexModel([("user_id", ASCENDING)], name="user_unique", unique=True),
+    ],
+    "jobs": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("status", ASCENDING), ("priority", DESCENDING), ("run_at", ASCENDING)], name="status_priority_run_at"),
+        IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)], name="status_lease"),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="user_created"),
+        IndexModel([("user_id", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="user_status_created"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_ttl", expireAfterSeconds=0),
+    ],
+}
+
+# Index option/key conflicts mean an older definition exists under the same name
+INDEX_CONFLICT_CODES = {85, 86}
+
+async def ensure_indexes():
+    """Idempotently create every index declared in INDEXES"""
+    for collection_name, indexes in INDEXES.items():
+        collection = db[collection_name]
+        for index in indexes:
+            name = index.document["name"]
+            try:
+                await collection.create_indexes([index])
+            except OperationFailure as e:
+                if e.code not in INDEX_CONFLICT_CODES:
+                    logger.error(f"Index {collection_name}.{name} could not be created: {str(e)}")
+                    continue
+                logger.info(f"Rebuilding index {collection_name}.{name} with its new definition")
+                try:
+                    await collection.drop_index(name)
+                    await collection.create_indexes([index])
+                except OperationFailure as e:
+                    # Usually a new unique constraint that existing duplicates violate
+                    logger.error(f"Index {collection_name}.{name} could not be rebuilt: {str(e)}")
+
+# Representative query shape of every route, used by the query plan audit
+AUDIT_USER_ID = "00000000-0000-0000-0000-000000000000"
+QUERY_SHAPES = [
+    ("register/login", "users", {"email": "audit@example.com"}, None),
+    ("get_current_user", "users", {"id": AUDIT_USER_ID}, None),
+    ("get_leads", "leads", {"user_id": AUDIT_USER_ID}, [("updated_at", -1), ("id", -1)]),
+    ("get_leads?status", "leads", {"user_id": AUDIT_USER_ID, "status": "new"}, [("updated_at", -1), ("id", -1)]),
+    ("get_lead", "leads", {"id": AUDIT_USER_ID, "user_id": AUDIT_USER_ID}, None),
+    ("get_lead_stats", "lead_stats", {"user_id": AUDIT_USER_ID}, None),
+    ("recompute_lead_stats", "leads", {"user_id": AUDIT_USER_ID}, None),
+    ("search_leads?industry", "leads", {"user_id": AUDIT_USER_ID, "industry": "Technology"}, [("updated_at", -1), ("id", -1)]),
+    ("search_leads?min_score", "leads", {"user_id": AUDIT_USER_ID, "qualification_score": {"$gte": 5}}, [("qualification_score", -1), ("id", -1)]),
+    ("seed_example_leads", "leads", {"company_key": "audit", "user_id": AUDIT_USER_ID}, None),
+    ("create_lead", "leads", {"user_id": AUDIT_USER_ID, "$or": [{"company_key": {"$in": ["audit"]}}, {"website_domain": {"$in": ["example.com"]}}, {"company_lsh": {"$in": [1, 2]}}]}, None),
+    ("get_contacts", "contacts", {"user_id": AUDIT_USER_ID}, [("created_at", -1), ("id", -1)]),
+    ("get_contacts?lead_id", "contacts", {"user_id": AUDIT_USER_ID, "lead_id": AUDIT_USER_ID}, [("created_at", -1), ("id", -1)]),
+    ("create_contact", "contacts", {"user_id": AUDIT_USER_ID, "$or": [{"email_norm": "audit@example.com"}, {"linkedin_handle": "audit"}]}, None),
+    ("get_contacts?domain", "contacts", {"user_id": AUDIT_USER_ID, "email_domain": "example.com"}, [("created_at", -1), ("id", -1)]),
+    ("update_contact", "contacts", {"id": AUDIT_USER_ID, "user_id": AUDIT_USER_ID}, None),
+    ("delete_lead", "contacts", {"lead_id": AUDIT_USER_ID}, None),
+    ("claim_scoring_batch", "leads", {"user_id": AUDIT_USER_ID, "ai_score_pending": True}, None),
+    ("claim_job", "jobs", {"status": "queued", "run_at": {"$lte": datetime(2000, 1, 1)}}, [("priority", -1), ("run_at", 1)]),
+    ("get_jobs", "jobs", {"user_id": AUDIT_USER_ID}, [("created_at", -1), ("id", -1)]),
+    ("get_templates", "templates", {"user_id": AUDIT_USER_ID}, None),
+    ("update_template", "templates", {"id": AUDIT_USER_ID, "user_id": AUDIT_USER_ID}, None),
+]
+
+def plan_stages(plan: dict) -> List[str]:
+    stages = [plan["stage"]] if "stage" in plan else []
+    for key in ("inputStage", "queryPlan"):
+        if isinstance(plan.get(key), dict):
+            stages.extend(plan_stages(plan[key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(plan_stages(child))
+    return stages
+
+async def audit_query_plans() -> List[dict]:
+    """Explain every route's query shape and report which ones fall back to a COLLSCAN"""
+    report = []
+    for route, collection_name, query, sort in QUERY_SHAPES:
+        command = {"find": collection_name, "filter": query}
+        if sort:
+            command["sort"] = dict(sort)
+        explain = await db.command({"explain": command, "verbosity": "queryPlanner"})
+        stages = plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+        report.append({
+            "route": route,
+            "collection": collection_name,
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages
         })
-        if existing:
-            continue
-            
-        lead_id = str(uuid.uuid4())
-        lead_doc = {
-            "id": lead_id,
-            "company_name": lead_data["company_name"],
-            "industry": lead_data["industry"],
-            "company_size": lead_data["company_size"],
-            "website": lead_data["website"],
-            "status": "new",
-            "notes": lead_data["notes"],
-            "qualification_score": None,
-            "ai_insights": None,
-            "created_at": now,
-            "updated_at": now,
-            "user_id": user["id"]
-        }
-        await db.leads.insert_one(lead_doc)
-        created_count += 1
-    
-    return {"message": f"Created {created_count} example leads", "total_examples": len(EXAMPLE_LEADS)}
+    return report
+
+@app.on_event("startup")
+async def provision_indexes():
+    await ensure_indexes()
+    if QUERY_PLAN_AUDIT not in ("warn", "strict"):
+        return
+    report = await audit_query_plans()
+    offenders = [r for r in report if r["collscan"]]
+    for r in offenders:
+        logger.warning(f"COLLSCAN on {r['collection']} for {r['route']}: {' <- '.join(r['stages'])}")
+    if offenders and QUERY_PLAN_AUDIT == "strict":
+        raise RuntimeError(f"Query plan audit found {len(offenders)} collection scan(s)")
+    logger.info(f"Query plan audit checked {len(report)} query shapes, {len(offenders)} collection scan(s)")
+
+@app.on_event("startup")
+async def start_company_key_backfill():
+    spawn_background(backfill_all_company_keys())
+
+@app.on_event("startup")
+async def start_stats_reconciliation():
+    if STATS_RECONCILE_SECONDS > 0:
+        spawn_background(reconcile_lead_stats())
+
+@app.on_event("startup")
+async def start_scoring_workers():
+    if not AI_SCORING_ENABLED:
+        return
+    if not llm_client.configured:
+        logger.warning("AI scoring enabled but no LLM is configured; scoring workers not started")
+        return
+    spawn_background(watch_scoring_changes())
+    for _ in range(AI_SCORING_CONCURRENCY):
+        spawn_background(scoring_worker())
+
+@app.on_event("startup")
+async def start_job_workers():
+    if JOB_WORKERS_IN_PROCESS > 0:
+        spawn_background(run_job_workers(JOB_WORKERS_IN_PROCESS))
+
+@app.on_event("startup")
+async def start_change_feed():
+    if CHANGE_FEED_SOURCE != "auto":
+        return
+    stream = await open_change_stream()
+    if stream is not None:
+        change_feed.source = "change_stream"
+        spawn_background(run_change_stream(stream))
 
 # Include router and middleware
 app.include_router(api_router)
@@ -582,8 +4009,14 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+# Added last so it is outermost and times CORS handling too
+app.add_middleware(MetricsMiddleware)
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    stop_job_workers()
     client.close()
+    password_executor.shutdown(wait=False)
@@ -0,0 +1,89 @@
+"""Run the API against mongomock-motor with the stub LLM backend; every test gets an empty database."""
+import os
+import sys
+import types
+from pathlib import Path
+
+import httpx
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# server reads its settings at import time
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ['DB_NAME'] = 'spinmr_test'
+os.environ['LLM_BACKEND'] = 'stub'
+os.environ['LLM_STUB_LATENCY_MS'] = '0'
+os.environ['AI_SCORING_ENABLED'] = 'false'
+os.environ['STATS_RECONCILE_SECONDS'] = '0'
+os.environ['JOB_WORKERS_IN_PROCESS'] = '0'
+os.environ['BCRYPT_ROUNDS'] = '4'
+
+try:
+    import emergentintegrations.llm.chat  # noqa: F401
+except ImportError:
+    # The stub backend never calls LlmChat, but server imports it at load time
+    chat = types.ModuleType("emergentintegrations.llm.chat")
+    chat.LlmChat = chat.UserMessage = None
+    sys.modules["emergentintegrations"] = types.ModuleType("emergentintegrations")
+    sys.modules["emergentintegrations.llm"] = types.ModuleType("emergentintegrations.llm")
+    sys.modules["emergentintegrations.llm.chat"] = chat
+
+import motor.motor_asyncio  # noqa: E402
+from mongomock_motor import AsyncMongoMockClient, AsyncMongoMockCollection  # noqa: E402
+from pymongo import ReturnDocument  # noqa: E402
+
+
+def mock_client(url, **kwargs):
+    # mongomock has no command monitoring
+    kwargs.pop("event_listeners", None)
+    return AsyncMongoMockClient(url, **kwargs)
+
+
+motor.motor_asyncio.AsyncIOMotorClient = mock_client
+
+_find_one_and_update = AsyncMongoMockCollection.find_one_and_update
+
+
+async def find_one_and_update(self, filter, update, projection=None, sort=None,
+                              return_document=ReturnDocument.BEFORE, **kwargs):
+    # mongomock re-runs the filter to fetch the updated document, which misses it whenever
+    # the update changes a filtered field (claiming a queued job, leasing a lead)
+    if return_document != ReturnDocument.AFTER:
+        return await _find_one_and_update(self, filter, update, projection, sort=sort, **kwargs)
+    before = await _find_one_and_update(self, filter, update, {"_id": 1}, sort=sort, **kwargs)
+    return await self.find_one({"_id": before["_id"]}, projection) if before else None
+
+
+AsyncMongoMockCollection.find_one_and_update = find_one_and_update
+
+import server  # noqa: E402
+
+# mongomock has no sessions
+server.transactions_supported = False
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def client():
+    await server.client.drop_database(server.db.name)
+    server.user_cache.clear()
+    await server.ensure_indexes()
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        yield http
+
+
+@pytest.fixture
+async def auth(client):
+    """Authorization headers of a freshly registered user"""
+    response = await client.post(
+        "/api/auth/register", json={"email": "rep@example.com", "password": "password", "name": "Rep"}
+    )
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['token']}"}
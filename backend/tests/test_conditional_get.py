@@ -0,0 +1,66 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_unchanged_list_is_not_modified(client, auth):
+    first = await client.get("/api/leads", headers=auth)
+    etag = first.headers["ETag"]
+    assert etag.startswith('W/"')
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    second = await client.get("/api/leads", headers={**auth, "If-None-Match": etag})
+
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["ETag"] == etag
+
+
+async def test_write_changes_the_etag(client, auth):
+    etag = (await client.get("/api/leads", headers=auth)).headers["ETag"]
+    created = await client.post("/api/leads", json={"company_name": "Globex"}, headers=auth)
+    assert created.status_code == 201
+
+    response = await client.get("/api/leads", headers={**auth, "If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert [lead["company_name"] for lead in response.json()] == ["Globex"]
+
+
+async def test_query_string_is_part_of_the_etag(client, auth):
+    etag = (await client.get("/api/leads", headers=auth)).headers["ETag"]
+
+    response = await client.get("/api/leads", params={"status": "won"}, headers={**auth, "If-None-Match": etag})
+
+    assert response.status_code == 200
+
+
+async def test_stats_follow_lead_writes(client, auth):
+    etag = (await client.get("/api/leads/stats/summary", headers=auth)).headers["ETag"]
+    assert (await client.get("/api/leads/stats/summary", headers={**auth, "If-None-Match": etag})).status_code == 304
+
+    await client.post("/api/leads", json={"company_name": "Initech"}, headers=auth)
+
+    assert (await client.get("/api/leads/stats/summary", headers={**auth, "If-None-Match": etag})).status_code == 200
+
+
+async def test_other_users_writes_keep_etag(client, auth):
+    etag = (await client.get("/api/leads", headers=auth)).headers["ETag"]
+    other = await client.post(
+        "/api/auth/register", json={"email": "other@example.com", "password": "password", "name": "Other"}
+    )
+    other_auth = {"Authorization": f"Bearer {other.json()['token']}"}
+    await client.post("/api/leads", json={"company_name": "Umbrella"}, headers=other_auth)
+
+    response = await client.get("/api/leads", headers={**auth, "If-None-Match": etag})
+
+    assert response.status_code == 304
+
+
+async def test_wildcard_and_tag_lists_match(client, auth):
+    etag = (await client.get("/api/templates", headers=auth)).headers["ETag"]
+
+    for if_none_match in ("*", f'W/"stale", {etag}'):
+        response = await client.get("/api/templates", headers={**auth, "If-None-Match": if_none_match})
+        assert response.status_code == 304
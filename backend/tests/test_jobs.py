@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+def utcnow():
+    # Stored datetimes come back naive, in UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+@pytest.fixture
+def failing_seed(monkeypatch):
+    """Make seed_leads jobs raise the given exception"""
+    def fail_with(error: Exception):
+        async def handler(data, user):
+            raise error
+        monkeypatch.setitem(server.JOB_TYPES, "seed_leads", (server.SeedLeadsJob, handler))
+    return fail_with
+
+
+async def queue_seed_job(client, auth, max_attempts=2) -> str:
+    response = await client.post("/api/jobs", json={"type": "seed_leads", "max_attempts": max_attempts}, headers=auth)
+    assert response.status_code == 202, response.text
+    return response.json()["job_id"]
+
+
+async def run_next(job_id: str):
+    # Backoff pushes run_at into the future; the test does not wait for it
+    await server.db.jobs.update_one({"id": job_id}, {"$set": {"run_at": datetime.now(timezone.utc)}})
+    job = await server.claim_job("test-worker")
+    assert job["id"] == job_id
+    await server.run_job(job, "test-worker")
+    return await server.db.jobs.find_one({"id": job_id}, {"_id": 0})
+
+
+async def test_transient_failure_is_retried_then_dead_lettered(client, auth, failing_seed):
+    failing_seed(RuntimeError("upstream unavailable"))
+    job_id = await queue_seed_job(client, auth, max_attempts=2)
+
+    job = await run_next(job_id)
+    assert job["status"] == "queued"
+    assert job["attempts"] == 1
+    assert job["error"] == "upstream unavailable"
+    assert job["run_at"] > utcnow()
+    assert job["expires_at"] is None
+
+    job = await run_next(job_id)
+    assert job["status"] == "dead"
+    assert job["attempts"] == 2
+    assert job["expires_at"] > utcnow() + timedelta(seconds=server.JOB_RETENTION_SECONDS)
+
+    response = await client.get(f"/api/jobs/{job_id}/result", headers=auth)
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Job failed: upstream unavailable"
+
+
+async def test_client_error_is_dead_lettered_without_retrying(client, auth, failing_seed):
+    failing_seed(HTTPException(status_code=404, detail="Lead not found"))
+    job_id = await queue_seed_job(client, auth, max_attempts=5)
+
+    job = await run_next(job_id)
+
+    assert job["status"] == "dead"
+    assert job["attempts"] == 1
+    assert job["error"] == "Lead not found"
+
+
+async def test_retry_requeues_dead_job_with_fresh_attempts(client, auth, failing_seed, monkeypatch):
+    seed_handler = server.JOB_TYPES["seed_leads"]
+    failing_seed(RuntimeError("upstream unavailable"))
+    job_id = await queue_seed_job(client, auth, max_attempts=1)
+    assert (await run_next(job_id))["status"] == "dead"
+
+    response = await client.post(f"/api/jobs/{job_id}/retry", headers=auth)
+    assert response.status_code == 202
+    job = (await client.get(f"/api/jobs/{job_id}", headers=auth)).json()
+    assert job["status"] == "queued"
+    assert job["attempts"] == 0
+    assert job["error"] is None
+    assert job["expires_at"] is None
+
+    monkeypatch.setitem(server.JOB_TYPES, "seed_leads", seed_handler)
+    job = await run_next(job_id)
+    assert job["status"] == "completed"
+    response = await client.get(f"/api/jobs/{job_id}/result", headers=auth)
+    assert response.status_code == 200
+    assert response.json()["created"] == len(server.EXAMPLE_LEADS)
+
+
+async def test_only_dead_jobs_can_be_retried(client, auth):
+    job_id = await queue_seed_job(client, auth)
+
+    assert (await client.post(f"/api/jobs/{job_id}/retry", headers=auth)).status_code == 409
+    assert (await client.post("/api/jobs/missing/retry", headers=auth)).status_code == 404
+
+
+async def test_expired_lease_returns_job_to_queue(client, auth):
+    job_id = await queue_seed_job(client, auth)
+    await server.claim_job("dead-worker")
+    await server.db.jobs.update_one(
+        {"id": job_id}, {"$set": {"lease_expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)}}
+    )
+
+    await server.requeue_expired_jobs()
+
+    job = await server.db.jobs.find_one({"id": job_id}, {"_id": 0})
+    assert job["status"] == "queued"
+    assert job["worker_id"] is None
+    assert job["error"] == "Visibility timeout expired"
@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("name", ["Acme", "ACME, Inc.", "Acme Inc", "acme.com", "Ácme LLC"])
+def test_company_names_normalize_to_one_key(name):
+    assert server.normalize_company(name) == "acme"
+
+
+@pytest.mark.parametrize("website, domain", [
+    ("https://www.Acme.com/about", "acme.com"),
+    ("https://linkedin.com/company/acme/", "linkedin.com/company/acme"),
+    ("https://sites.google.com/view/acme", "sites.google.com/view/acme"),
+    ("https://linkedin.com", None),
+    (None, None),
+])
+def test_website_domain(website, domain):
+    assert server.normalize_domain(website) == domain
+
+
+def lead(company_name, website=None, lead_id="existing"):
+    return {"id": lead_id, "company_name": company_name, **server.company_fields({"company_name": company_name, "website": website})}
+
+
+@pytest.mark.parametrize("new, existing, matched_on", [
+    (lead("ACME, Inc."), lead("Acme"), "company"),
+    (lead("Northwind Trader"), lead("Northwind Traders"), "similar_name"),
+    (lead("Roadrunner Supply", "acme.com/shop"), lead("Acme", "https://acme.com"), "domain"),
+    (lead("Globex", "https://linkedin.com/company/globex"), lead("Initech", "https://linkedin.com/company/initech"), None),
+    (lead("Globex"), lead("Initech"), None),
+])
+def test_match_outcomes(new, existing, matched_on):
+    match = server.match_lead(new, existing)
+
+    assert (match and match["matched_on"]) == matched_on
+    if match:
+        assert match["lead_id"] == "existing"
+        assert match["company_name"] == existing["company_name"]
+
+
+async def create(client, auth, **lead_fields):
+    return await client.post("/api/leads", json=lead_fields, headers=auth)
+
+
+async def test_same_company_is_rejected(client, auth):
+    existing = (await create(client, auth, company_name="Acme Inc")).json()
+
+    response = await create(client, auth, company_name="ACME, LLC")
+
+    assert response.status_code == 409
+    assert existing["id"] in response.json()["detail"]
+
+
+async def test_near_matches_are_created_with_warnings(client, auth):
+    northwind = (await create(client, auth, company_name="Northwind Traders")).json()
+    acme = (await create(client, auth, company_name="Acme", website="https://acme.com")).json()
+
+    similar = await create(client, auth, company_name="Northwind Trader")
+    same_site = await create(client, auth, company_name="Roadrunner Supply", website="www.acme.com")
+    unrelated = await create(client, auth, company_name="Globex")
+
+    assert similar.status_code == 201
+    assert [(m["lead_id"], m["matched_on"]) for m in similar.json()["possible_duplicates"]] == [(northwind["id"], "similar_name")]
+    assert same_site.status_code == 201
+    assert [(m["lead_id"], m["matched_on"]) for m in same_site.json()["possible_duplicates"]] == [(acme["id"], "domain")]
+    assert unrelated.status_code == 201
+    assert unrelated.json()["possible_duplicates"] == []
+
+
+async def test_allow_skips_the_duplicate_check(client, auth):
+    await create(client, auth, company_name="Acme Inc")
+
+    response = await client.post("/api/leads", params={"on_duplicate": "allow"}, json={"company_name": "Acme LLC"}, headers=auth)
+
+    assert response.status_code == 201
+    assert response.json()["possible_duplicates"] == []
+
+
+async def test_import_merges_same_company_and_flags_near_matches(client, auth):
+    acme = (await create(client, auth, company_name="Acme Inc", website="https://acme.com")).json()
+    # New rows first: mongomock numbers upserted ids by upsert rather than by op
+    rows = [
+        {"company_name": "Roadrunner Supply", "website": "acme.com"},
+        {"company_name": "ACME, LLC", "industry": "Manufacturing"},
+    ]
+    body = "\n".join(json.dumps(row) for row in rows)
+
+    response = await client.post("/api/leads/import", params={"format": "ndjson"}, content=body, headers=auth)
+
+    report = response.json()
+    assert response.status_code == 200, report
+    assert (report["created"], report["merged"], report["failed"]) == (1, 1, 0)
+    assert [(d["row"], d["duplicate_of"]["matched_on"]) for d in report["possible_duplicates"]] == [(1, "domain")]
+    merged = (await client.get(f"/api/leads/{acme['id']}", headers=auth)).json()
+    assert merged["company_name"] == "Acme Inc"
+    assert merged["industry"] == "Manufacturing"
@@ -0,0 +1,86 @@
+import base64
+import json
+import uuid
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+async def seed_leads(client, auth, timestamps):
+    user_id = (await client.get("/api/auth/me", headers=auth)).json()["id"]
+    await server.db.leads.insert_many([
+        {
+            "id": str(uuid.uuid4()),
+            "company_name": f"Company {n}",
+            "status": "new",
+            "created_at": timestamp,
+            "updated_at": timestamp,
+            "user_id": user_id
+        }
+        for n, timestamp in enumerate(timestamps)
+    ])
+
+
+async def walk(client, auth, path, limit):
+    pages, cursor = [], None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = await client.get(path, params=params, headers=auth)
+        assert response.status_code == 200, response.text
+        pages.append(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return pages
+
+
+def test_cursor_round_trip():
+    values = ["2026-01-02T03:04:05.678901+00:00", str(uuid.uuid4())]
+    cursor = server.encode_cursor(values)
+    assert "=" not in cursor
+    assert server.decode_cursor(cursor) == values
+
+
+async def test_pages_cover_every_lead_once_in_order(client, auth):
+    # Shared timestamps make the id the tie-breaker across page boundaries
+    timestamps = [f"2026-01-0{day}T00:00:00+00:00" for day in (1, 1, 1, 2, 2, 3, 4, 4)]
+    await seed_leads(client, auth, timestamps)
+
+    pages = await walk(client, auth, "/api/leads", limit=3)
+
+    assert [len(page) for page in pages] == [3, 3, 2]
+    leads = [lead for page in pages for lead in page]
+    assert len({lead["id"] for lead in leads}) == len(timestamps)
+    keys = [(lead["updated_at"], lead["id"]) for lead in leads]
+    assert keys == sorted(keys, reverse=True)
+
+
+async def test_exact_page_has_no_next_cursor(client, auth):
+    await seed_leads(client, auth, ["2026-01-01T00:00:00+00:00"] * 2)
+
+    response = await client.get("/api/leads", params={"limit": 2}, headers=auth)
+
+    assert len(response.json()) == 2
+    assert "X-Next-Cursor" not in response.headers
+
+
+def raw_cursor(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64 at all!",
+    raw_cursor({"updated_at": "2026-01-01T00:00:00+00:00"}),
+    raw_cursor(["2026-01-01T00:00:00+00:00"]),
+    raw_cursor(["2026-01-01T00:00:00+00:00", "id", "extra"]),
+    raw_cursor([{"$gt": ""}, "id"]),
+    raw_cursor(["2026-01-01T00:00:00+00:00", {"$ne": None}]),
+    raw_cursor(["yesterday", "id"]),
+])
+async def test_malformed_cursor_is_rejected(client, auth, cursor):
+    response = await client.get("/api/leads", params={"cursor": cursor}, headers=auth)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
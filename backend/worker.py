@@ -0,0 +1,35 @@
+"""Job queue worker: runs jobs queued through POST /api/jobs outside the API process.
+
+    cd backend
+    python worker.py --concurrency 4
+
+On SIGINT/SIGTERM it stops claiming jobs and waits up to --grace seconds
+for the jobs in hand; anything still running is handed back to the queue.
+"""
+import argparse
+import asyncio
+import signal
+
+import server
+
+
+async def main(concurrency: int, grace: float):
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, server.stop_job_workers)
+
+    workers = asyncio.create_task(server.run_job_workers(concurrency))
+    await server.job_shutdown.wait()
+    try:
+        await asyncio.wait_for(workers, timeout=grace)
+    except asyncio.TimeoutError:
+        server.logger.warning("Jobs still running after the grace period were returned to the queue")
+    server.client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=server.JOB_WORKER_CONCURRENCY)
+    parser.add_argument("--grace", type=float, default=30.0, help="seconds to let running jobs finish on shutdown")
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency, args.grace))
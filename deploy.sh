@@ -73,11 +73,18 @@ module.exports = {
     env: {
       NODE_ENV: 'production'
     }
+  }, {
+    name: 'spinmr-worker',
+    cwd: './backend',
+    script: 'venv/bin/python',
+    args: 'worker.py',
+    kill_timeout: 35000
   }]
 };
 EOF
 
 pm2 delete spinmr-backend 2>/dev/null || true
+pm2 delete spinmr-worker 2>/dev/null || true
 pm2 start ecosystem.config.js
 pm2 save
 
@@ -32,6 +32,12 @@ api.interceptors.response.use(
     }
 );
 
+// Lists come back a page at a time; res.nextCursor loads the following page, and is null on the last one
+const getPage = async (url, params = {}) => {
+    const res = await api.get(url, { params });
+    return { ...res, nextCursor: res.headers['x-next-cursor'] || null };
+};
+
 // Auth API
 export const authAPI = {
     register: (data) => api.post('/auth/register', data),
@@ -42,19 +48,34 @@ export const authAPI = {
 // Leads API
 export const leadsAPI = {
     create: (data) => api.post('/leads', data),
-    getAll: (status) => api.get('/leads', { params: { status } }),
+    getAll: (status, { cursor, limit } = {}) => getPage('/leads', { status, cursor, limit }),
+    getMany: (ids, fields) => api.get('/leads', { params: { ids: ids.join(','), fields, limit: ids.length } }),
+    search: (params) => api.get('/leads/search', { params }),
     getOne: (id) => api.get(`/leads/${id}`),
     update: (id, data) => api.put(`/leads/${id}`, data),
     delete: (id) => api.delete(`/leads/${id}`),
+    bulk: (data) => api.post('/leads/bulk', data),
     getStats: () => api.get('/leads/stats/summary'),
+    import: (file, format = 'csv') => api.post('/leads/import', file, {
+        params: { format },
+        headers: { 'Content-Type': format === 'csv' ? 'text/csv' : 'application/x-ndjson' },
+    }),
+    export: (format = 'csv') => api.get('/leads/export', { params: { format }, responseType: 'blob' }),
+    findDuplicates: () => api.post('/leads/duplicates'),
 };
 
 // Contacts API
 export const contactsAPI = {
     create: (data) => api.post('/contacts', data),
-    getAll: (leadId) => api.get('/contacts', { params: { lead_id: leadId } }),
+    getAll: (leadId, { cursor, limit } = {}) => getPage('/contacts', { lead_id: leadId, cursor, limit }),
     update: (id, data) => api.put(`/contacts/${id}`, data),
     delete: (id) => api.delete(`/contacts/${id}`),
+    find: (params) => getPage('/contacts', params),
+    import: (file, format = 'csv') => api.post('/contacts/import', file, {
+        params: { format },
+        headers: { 'Content-Type': format === 'csv' ? 'text/csv' : 'application/x-ndjson' },
+    }),
+    findDuplicates: () => api.post('/contacts/duplicates'),
 };
 
 // Templates API
@@ -63,14 +84,27 @@ export const templatesAPI = {
     getAll: () => api.get('/templates'),
     update: (id, data) => api.put(`/templates/${id}`, data),
     delete: (id) => api.delete(`/templates/${id}`),
+    render: (id, data) => api.post(`/templates/${id}/render`, data),
+    merge: (id, data) => api.post(`/templates/${id}/merge`, data),
 };
 
 // AI API
 export const aiAPI = {
     researchCompany: (data) => api.post('/ai/research', data),
     discoverContacts: (data) => api.post('/ai/discover-contacts', data),
+    researchBatch: (data) => api.post('/ai/research/batch', data),
     generateEmail: (leadId, templateId) => 
         api.post(`/ai/generate-email?lead_id=${leadId}${templateId ? `&template_id=${templateId}` : ''}`),
 };
 
+// Jobs API
+export const jobsAPI = {
+    create: (type, payload = {}, priority = 0) => api.post('/jobs', { type, payload, priority }),
+    getAll: (status) => api.get('/jobs', { params: { status } }),
+    get: (id) => api.get(`/jobs/${id}`),
+    getResult: (id) => api.get(`/jobs/${id}/result`),
+    retry: (id) => api.post(`/jobs/${id}/retry`),
+    delete: (id) => api.delete(`/jobs/${id}`),
+};
+
 export default api;
@@ -0,0 +1,85 @@
+import { useEffect, useRef } from 'react';
+
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+const CHANGES_URL = `${BACKEND_URL.replace(/^http/, 'ws')}/api/changes`;
+const MAX_RECONNECT_DELAY_MS = 30000;
+const POLICY_VIOLATION = 1008;
+
+// Keep a change feed socket open, resuming from the last token after a reconnect.
+// onChange gets each change event; onResync means events were missed and the lists should be refetched.
+export const subscribeChanges = (collections, { onChange, onResync }) => {
+    let socket = null;
+    let token = null;
+    let attempts = 0;
+    let timer = null;
+    let closed = false;
+
+    const connect = () => {
+        const params = new URLSearchParams({ collections: collections.join(',') });
+        if (token) params.set('resume', token);
+        socket = new WebSocket(`${CHANGES_URL}?${params}`);
+        // The JWT goes in the first message rather than the URL, which ends up in access logs
+        socket.onopen = () => {
+            socket.send(JSON.stringify({ type: 'auth', token: localStorage.getItem('token') || '' }));
+        };
+        socket.onmessage = (message) => {
+            const event = JSON.parse(message.data);
+            if (event.type === 'change') {
+                token = event.token;
+                onChange(event);
+            } else if (event.type === 'ready') {
+                attempts = 0;
+                // Nothing was missed on the first connect; a reconnect that could not replay has to refetch
+                if (token && !event.resumed) onResync();
+                token = event.token;
+            } else if (event.type === 'resync') {
+                token = event.token;
+                onResync();
+            }
+        };
+        socket.onclose = (event) => {
+            // A rejected token is handled by the REST interceptor, not by retrying
+            if (closed || event.code === POLICY_VIOLATION) return;
+            const delay = Math.min(MAX_RECONNECT_DELAY_MS, 1000 * 2 ** attempts++);
+            timer = setTimeout(connect, delay);
+        };
+    };
+
+    connect();
+    return () => {
+        closed = true;
+        clearTimeout(timer);
+        socket?.close();
+    };
+};
+
+// Subscribe for the lifetime of a component; handlers may change between renders without reconnecting
+export const useChanges = (collections, handlers) => {
+    const handlersRef = useRef(handlers);
+    handlersRef.current = handlers;
+    const key = collections.join(',');
+
+    useEffect(() => subscribeChanges(key.split(','), {
+        onChange: (event) => handlersRef.current.onChange?.(event),
+        onResync: () => handlersRef.current.onResync?.(),
+    }), [key]);
+};
+
+// Apply one change event to a list of documents; keep decides whether a document belongs in the list
+export const applyChange = (items, event, keep = () => true) => {
+    if (event.op === 'insert') {
+        return keep(event.doc) && !items.some((item) => item.id === event.id) ? [event.doc, ...items] : items;
+    }
+    if (event.op === 'delete') {
+        return items.filter((item) => item.id !== event.id);
+    }
+    if (event.op === 'update') {
+        return items.flatMap((item) => {
+            if (item.id !== event.id) return [item];
+            const updated = { ...item, ...event.fields };
+            (event.removed || []).forEach((field) => delete updated[field]);
+            return keep(updated) ? [updated] : [];
+        });
+    }
+    return items;
+};
@@ -10,27 +10,34 @@ import { Link } from 'react-router-dom';
 
 export default function Contacts() {
     const [contacts, setContacts] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [leads, setLeads] = useState({});
     const [loading, setLoading] = useState(true);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [searchQuery, setSearchQuery] = useState('');
 
     useEffect(() => {
         fetchData();
     }, []);
 
+    // Look up only the leads a page of contacts refers to, not the whole account
+    const fetchLeadsFor = async (page, known) => {
+        const ids = [...new Set(page.map(contact => contact.lead_id))].filter(id => !known[id]);
+        if (ids.length === 0) return known;
+        const res = await leadsAPI.getMany(ids, 'id,company_name');
+        const leadsMap = { ...known };
+        res.data.forEach(lead => {
+            leadsMap[lead.id] = lead;
+        });
+        return leadsMap;
+    };
+
     const fetchData = async () => {
         try {
-            const [contactsRes, leadsRes] = await Promise.all([
-                contactsAPI.getAll(),
-                leadsAPI.getAll()
-            ]);
+            const contactsRes = await contactsAPI.getAll();
             setContacts(contactsRes.data);
-            // Create a map of lead id to lead for quick lookup
-            const leadsMap = {};
-            leadsRes.data.forEach(lead => {
-                leadsMap[lead.id] = lead;
-            });
-            setLeads(leadsMap);
+            setNextCursor(contactsRes.nextCursor);
+            setLeads(await fetchLeadsFor(contactsRes.data, {}));
         } catch (error) {
             toast.error('Failed to load contacts');
         } finally {
@@ -38,6 +45,20 @@ export default function Contacts() {
         }
     };
 
+    const loadMoreContacts = async () => {
+        setLoadingMore(true);
+        try {
+            const res = await contactsAPI.getAll(undefined, { cursor: nextCursor });
+            setContacts(current => [...current, ...res.data]);
+            setNextCursor(res.nextCursor);
+            setLeads(await fetchLeadsFor(res.data, leads));
+        } catch (error) {
+            toast.error('Failed to load more contacts');
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     const handleDelete = async (id) => {
         if (!window.confirm('Delete this contact?')) return;
         try {
@@ -182,6 +203,13 @@ export default function Contacts() {
                     })}
                 </div>
             )}
+            {nextCursor && (
+                <div className="flex justify-center">
+                    <Button variant="outline" onClick={loadMoreContacts} disabled={loadingMore} data-testid="load-more-contacts-btn">
+                        {loadingMore ? 'Loading...' : 'Load more'}
+                    </Button>
+                </div>
+            )}
         </div>
     );
 }
@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import { leadsAPI } from '../lib/api';
+import { useChanges, applyChange } from '../lib/changes';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '../components/ui/card';
 import { Button } from '../components/ui/button';
 import { Badge } from '../components/ui/badge';
@@ -26,11 +27,24 @@ export default function Dashboard() {
         fetchData();
     }, []);
 
+    useChanges(['leads', 'lead_stats'], {
+        onChange: (event) => {
+            if (event.collection === 'lead_stats') {
+                setStats(event.doc);
+            } else if (event.op === 'invalidate') {
+                fetchData();
+            } else {
+                setRecentLeads((leads) => applyChange(leads, event).slice(0, 5));
+            }
+        },
+        onResync: () => fetchData(),
+    });
+
     const fetchData = async () => {
         try {
             const [statsRes, leadsRes] = await Promise.all([
                 leadsAPI.getStats(),
-                leadsAPI.getAll()
+                leadsAPI.getAll(undefined, { limit: 5 })
             ]);
             setStats(statsRes.data);
             setRecentLeads(leadsRes.data.slice(0, 5));
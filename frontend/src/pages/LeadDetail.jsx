@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react';
 import { useParams, useNavigate, Link } from 'react-router-dom';
 import { leadsAPI, contactsAPI, aiAPI } from '../lib/api';
+import { useChanges, applyChange } from '../lib/changes';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '../components/ui/card';
 import { Button } from '../components/ui/button';
 import { Input } from '../components/ui/input';
@@ -18,6 +19,9 @@ import {
 } from 'lucide-react';
 import { toast } from 'sonner';
 
+// One lead's contacts fit in a single page (the server's maximum)
+const CONTACTS_PER_LEAD = 1000;
+
 export default function LeadDetail() {
     const { id } = useParams();
     const navigate = useNavigate();
@@ -37,11 +41,35 @@ export default function LeadDetail() {
         fetchData();
     }, [id]);
 
+    useChanges(['leads', 'contacts'], {
+        onChange: async (event) => {
+            if (event.op === 'invalidate') {
+                if (event.collection === 'leads') {
+                    fetchData();
+                } else {
+                    const res = await contactsAPI.getAll(id, { limit: CONTACTS_PER_LEAD });
+                    setContacts(res.data);
+                }
+            } else if (event.collection === 'contacts') {
+                setContacts((current) => applyChange(current, event, (contact) => contact.lead_id === id));
+            } else if (event.id === id && event.op === 'delete') {
+                toast.info('This lead was deleted');
+                navigate('/leads');
+            } else if (event.id === id && event.op === 'update') {
+                setLead((current) => current && { ...current, ...event.fields });
+                if (event.fields.ai_insights) {
+                    setAiInsights(event.fields.ai_insights);
+                }
+            }
+        },
+        onResync: () => fetchData(),
+    });
+
     const fetchData = async () => {
         try {
             const [leadRes, contactsRes] = await Promise.all([
                 leadsAPI.getOne(id),
-                contactsAPI.getAll(id)
+                contactsAPI.getAll(id, { limit: CONTACTS_PER_LEAD })
             ]);
             setLead(leadRes.data);
             setEditData(leadRes.data);
@@ -88,7 +116,7 @@ export default function LeadDetail() {
             toast.success('Contact added');
             setShowContactDialog(false);
             setNewContact({ name: '', title: '', email: '', phone: '', linkedin: '', notes: '' });
-            const res = await contactsAPI.getAll(id);
+            const res = await contactsAPI.getAll(id, { limit: CONTACTS_PER_LEAD });
             setContacts(res.data);
         } catch (error) {
             toast.error('Failed to add contact');
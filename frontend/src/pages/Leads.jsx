@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react';
 import { Link, useSearchParams } from 'react-router-dom';
 import { leadsAPI } from '../lib/api';
+import { useChanges, applyChange } from '../lib/changes';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '../components/ui/card';
 import { Button } from '../components/ui/button';
 import { Input } from '../components/ui/input';
@@ -17,7 +18,9 @@ import { DropdownMenu, DropdownMenuContent, DropdownMenuItem, DropdownMenuTrigge
 export default function Leads() {
     const [searchParams, setSearchParams] = useSearchParams();
     const [leads, setLeads] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [loading, setLoading] = useState(true);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [searchQuery, setSearchQuery] = useState('');
     const [statusFilter, setStatusFilter] = useState(searchParams.get('status') || 'all');
     const [showAddDialog, setShowAddDialog] = useState(false);
@@ -33,12 +36,26 @@ export default function Leads() {
         fetchLeads();
     }, [statusFilter]);
 
+    useChanges(['leads'], {
+        onChange: (event) => {
+            const status = statusFilter === 'all' ? undefined : statusFilter;
+            // An update can move a lead into the filtered list, and the event only carries the changed fields
+            if (event.op === 'invalidate' || (status && event.fields?.status === status)) {
+                fetchLeads();
+                return;
+            }
+            setLeads((current) => applyChange(current, event, (lead) => !status || lead.status === status));
+        },
+        onResync: () => fetchLeads(),
+    });
+
     const fetchLeads = async () => {
         setLoading(true);
         try {
             const status = statusFilter === 'all' ? undefined : statusFilter;
             const res = await leadsAPI.getAll(status);
             setLeads(res.data);
+            setNextCursor(res.nextCursor);
         } catch (error) {
             toast.error('Failed to load leads');
         } finally {
@@ -46,19 +63,39 @@ export default function Leads() {
         }
     };
 
+    const loadMoreLeads = async () => {
+        setLoadingMore(true);
+        try {
+            const status = statusFilter === 'all' ? undefined : statusFilter;
+            const res = await leadsAPI.getAll(status, { cursor: nextCursor });
+            // A lead edited since the first page can show up again further down
+            setLeads((current) => [...current, ...res.data.filter((lead) => !current.some((item) => item.id === lead.id))]);
+            setNextCursor(res.nextCursor);
+        } catch (error) {
+            toast.error('Failed to load more leads');
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     const handleAddLead = async () => {
         if (!newLead.company_name.trim()) {
             toast.error('Company name is required');
             return;
         }
         try {
-            await leadsAPI.create(newLead);
-            toast.success('Lead added successfully');
+            const response = await leadsAPI.create(newLead);
+            const [similar] = response.data.possible_duplicates || [];
+            if (similar) {
+                toast.warning(`Lead added; it may duplicate ${similar.company_name}`);
+            } else {
+                toast.success('Lead added successfully');
+            }
             setShowAddDialog(false);
             setNewLead({ company_name: '', industry: '', company_size: '', website: '', notes: '' });
             fetchLeads();
         } catch (error) {
-            toast.error('Failed to add lead');
+            toast.error(error.response?.data?.detail || 'Failed to add lead');
         }
     };
 
@@ -313,6 +350,13 @@ export default function Leads() {
                     ))}
                 </div>
             )}
+            {!loading && nextCursor && (
+                <div className="flex justify-center">
+                    <Button variant="outline" onClick={loadMoreLeads} disabled={loadingMore} data-testid="load-more-leads-btn">
+                        {loadingMore ? 'Loading...' : 'Load more'}
+                    </Button>
+                </div>
+            )}
         </div>
     );
 }